@@ -30,62 +30,1739 @@ Implementation Notes
 """
 
 # imports
+import gc
 import json
+import os
+import struct
 import time
+from array import array
+from binascii import crc32
 
-import adafruit_touchscreen
-import board
 import displayio
-from digitalio import DigitalInOut
+import terminalio
+import vectorio
+from adafruit_button import Button
+from adafruit_display_text.label import Label
+
+try:
+    from typing import Any, Callable, Dict, List, Optional, Tuple
+except ImportError:
+    pass
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/adafruit/Adafruit_CircuitPython_PYOA.git"
+
+_MISSING = object()
+
+LOG_OFF = 0
+"""Don't log anything, the default"""
+LOG_INFO = 1
+"""Log each card as it is displayed"""
+LOG_DEBUG = 2
+"""Also log the card contents, text, backgrounds, sounds and button presses"""
+LOG_TRACE = 3
+"""Also log every touch"""
+
+TRANSITIONS = ("fade", "cut", "wipe", "slide")
+"""The ways of moving from one card to the next, set with ``"transition"`` in a
+card or in the game's ``settings``. ``fade`` (the default) fades the backlight out
+and back in. The others build the next card while the current one is still shown:
+``cut`` swaps it in all at once, ``wipe`` sweeps black bars across the screen and
+then off it again, and ``slide`` slides the next card in from the right."""
+_TRANSITION_STEPS = 8
+# positions tuned by hand for the original boards, by display width and height
+_TUNED_LAYOUTS = {
+    (160, 128): {"text_x": 3, "text_y": 38, "button_y": 107},  # PyBadge and PyGamer
+    (480, 320): {"text_x": 8, "text_y": 50, "button_y": 126},  # PyPortal Titano
+}
+
+
+def _join_path(directory: str, filename: str) -> str:
+    """Join a directory and a relative filename, resolving any ``.`` and ``..``, so
+    the same file always has the same path. There is no ``os.path`` on CircuitPython.
+    """
+    parts = []
+    for part in (directory + "/" + filename).split("/"):
+        if part == ".." and parts and parts[-1] not in {"", ".."}:
+            parts.pop()
+        elif part == ".." and parts == [""]:
+            pass  # there is nothing above the root
+        elif part != "." and (part or not parts):
+            parts.append(part)
+    return "/".join(parts)
+
+
+class RingBufferLog:
+    """A log sink that keeps the most recent messages in memory, so they can be
+    printed after something goes wrong.
+
+    :param int size: the number of messages to keep
+    """
+
+    def __init__(self, size: int = 32) -> None:
+        self._messages = [None] * size
+        self._next = 0
+
+    def __call__(self, message: str) -> None:
+        self._messages[self._next % len(self._messages)] = message
+        self._next += 1
+
+    @property
+    def messages(self) -> List[str]:
+        """The kept messages, oldest first."""
+        size = len(self._messages)
+        first = max(0, self._next - size)
+        return [self._messages[index % size] for index in range(first, self._next)]
+
+    def dump(self) -> None:
+        """Print the kept messages, oldest first."""
+        for message in self.messages:
+            print(message)
+
+
+def ease_linear(progress: float) -> float:
+    """Change the brightness at a constant speed. For use with
+    `PYOA_Graphics.backlight_fade`.
+
+    :param float progress: how far through the fade, from :py:const:`0.0` to :py:const:`1.0`
+    """
+    return progress
+
+
+def ease_in(progress: float) -> float:
+    """Start slowly and finish quickly.
+
+    :param float progress: how far through the fade, from :py:const:`0.0` to :py:const:`1.0`
+    """
+    return progress * progress
+
+
+def ease_out(progress: float) -> float:
+    """Start quickly and finish slowly.
+
+    :param float progress: how far through the fade, from :py:const:`0.0` to :py:const:`1.0`
+    """
+    return progress * (2 - progress)
+
+
+def ease_in_out(progress: float) -> float:
+    """Start and finish slowly.
+
+    :param float progress: how far through the fade, from :py:const:`0.0` to :py:const:`1.0`
+    """
+    return progress * progress * (3 - 2 * progress)
+
+
+class _LRUCache:
+    """A small least-recently-used cache.
+
+    :param int size: the number of entries to keep, at least 1
+    :param on_evict: called with each value that is pushed out of the cache
+    """
+
+    def __init__(self, size: int, on_evict: Optional[Callable[[Any], None]] = None) -> None:
+        if size < 1:
+            # the value in use, such as the sound that's playing, has to stay cached
+            raise ValueError("Cache size must be at least 1: ", size)
+        self._size = size
+        self._on_evict = on_evict
+        self._keys = []
+        self._values = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._values
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Return the value for ``key`` and mark it as most recently used."""
+        value = self._values.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        if self._keys[-1] != key:
+            self._keys.remove(key)
+            self._keys.append(key)
+        return value
+
+    def put(self, key: Any, value: Any) -> None:
+        """Add or replace ``key``, evicting the least recently used entry if full."""
+        if key in self._values:
+            self._keys.remove(key)
+        elif len(self._keys) >= self._size:
+            old_value = self._values.pop(self._keys.pop(0))
+            if self._on_evict:
+                self._on_evict(old_value)
+        self._keys.append(key)
+        self._values[key] = value
+
+    def discard(self, key: Any) -> None:
+        """Evict ``key`` if it is in the cache."""
+        value = self._values.pop(key, _MISSING)
+        if value is _MISSING:
+            return
+        self._keys.remove(key)
+        if self._on_evict:
+            self._on_evict(value)
+
+    def clear(self) -> None:
+        """Empty the cache, evicting every entry."""
+        while self._keys:
+            old_value = self._values.pop(self._keys.pop())
+            if self._on_evict:
+                self._on_evict(old_value)
+
+
+class LazyCards:
+    """A read-only list of cards that are parsed from a ``cyoa.json`` file on demand.
+
+    The file is scanned once to record where each card is stored, after that only
+    the card being displayed and a few recently used ones are kept in memory. Games
+    with ``settings`` keep their cards in a ``cards`` list, which is found the same way.
+
+    :param str filename: the game file to read
+    :param int cache_size: the number of parsed cards to keep around
+    """
+
+    def __init__(self, filename: str, *, cache_size: int = 4) -> None:
+        self._file = open(filename, "rb")
+        self._offsets = array("L")
+        self._lengths = array("L")
+        self._cards = _LRUCache(cache_size)
+        self.settings = {}
+        """The game's ``settings``, empty if it has none"""
+        self._scan()
+
+    def _scan(self) -> None:
+        """Record the byte offset and length of every card in the file.
+
+        Strings are skipped with ``bytes.find``, so only the few bytes between them
+        are looked at one by one, to follow the brackets.
+        """
+        depth = 0
+        # a plain list of cards has them at depth 2, a game with settings at depth 3
+        card_depth = 2
+        in_string = False
+        escaped = False
+        key = b""
+        section = b""
+        settings = None
+        start = 0
+        chunk_start = 0
+        while True:
+            chunk = self._file.read(512)
+            if not chunk:
+                break
+            index = 0
+            while index < len(chunk):
+                if in_string:
+                    quote = chunk.find(b'"', index)
+                    if quote < 0 or chunk[quote - 1] == 0x5C or escaped:
+                        quote, escaped = self._string_end(chunk, index, escaped)
+                    if depth == 1:
+                        key += chunk[index : len(chunk) if quote < 0 else quote]
+                    if quote < 0:
+                        break
+                    in_string = False
+                    index = quote + 1
+                quote = chunk.find(b'"', index)
+                end = len(chunk) if quote < 0 else quote
+                # most of the gaps between strings are a single colon or comma
+                if end - index == 1 and chunk[index] in b":,":
+                    end = index
+                for position in range(index, end):
+                    byte = chunk[position]
+                    if byte | 0x20 == 0x7B:  # [ or {
+                        depth += 1
+                        if depth == 2:
+                            section = key
+                        if depth == 1 and byte == 0x7B:
+                            card_depth = 3
+                        elif depth == card_depth and byte == 0x7B:
+                            start = chunk_start + position
+                        elif depth == 2 and key == b"settings":
+                            settings = chunk_start + position
+                    elif byte | 0x20 == 0x7D:  # ] or }
+                        is_card = card_depth == 2 or section == b"cards"
+                        if depth == card_depth and byte == 0x7D and is_card:
+                            self._offsets.append(start)
+                            self._lengths.append(chunk_start + position + 1 - start)
+                        elif depth == 2 and section == b"settings":
+                            settings = (settings, chunk_start + position + 1 - settings)
+                        depth -= 1
+                if quote < 0:
+                    break
+                in_string = True
+                if depth == 1:
+                    key = b""
+                index = quote + 1
+            chunk_start += len(chunk)
+        if settings:
+            self._file.seek(settings[0])
+            self.settings = json.loads(self._file.read(settings[1]).decode("utf-8"))
+
+    @staticmethod
+    def _string_end(chunk: bytes, index: int, escaped: bool) -> Tuple[int, bool]:
+        """Find the quote that closes a string, skipping quotes escaped with a
+        backslash.
+
+        :param bytes chunk: the chunk of the file
+        :param int index: where the rest of the string starts in the chunk
+        :param bool escaped: whether the first byte of the chunk is escaped by a
+            backslash at the end of the previous chunk
+        :return: where the closing quote is, or :py:const:`-1` if the string carries
+            on into the next chunk, and whether the next chunk starts escaped
+        :rtype: tuple(int, bool)
+        """
+        while True:
+            quote = chunk.find(b'"', index)
+            end = len(chunk) if quote < 0 else quote
+            backslashes = end
+            while backslashes > index and chunk[backslashes - 1] == 0x5C:
+                backslashes -= 1
+            # an odd number of backslashes escapes whatever follows them
+            odd = (end - backslashes) % 2 == 1
+            if backslashes == index and escaped:
+                odd = not odd
+            if quote < 0:
+                return -1, odd
+            if not odd:
+                return quote, False
+            index = quote + 1
+            escaped = False
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __getitem__(self, card_num: int) -> Dict[str, str]:
+        if card_num < 0:
+            card_num += len(self._offsets)
+        if not 0 <= card_num < len(self._offsets):
+            raise IndexError("card number out of range")
+        card = self._cards.get(card_num)
+        if card is None:
+            self._file.seek(self._offsets[card_num])
+            card = json.loads(self._file.read(self._lengths[card_num]).decode("utf-8"))
+            self._cards.put(card_num, card)
+        return card
+
+    def __iter__(self):
+        for card_num in range(len(self._offsets)):
+            yield self[card_num]
+
+    def close(self) -> None:
+        """Close the game file."""
+        self._cards.clear()
+        self._file.close()
+
+
+class CompiledCards:
+    """A read-only list of cards stored in a compiled ``cyoa.pyoa`` game file.
+
+    Compiled games are made from ``cyoa.json`` by ``examples/pyoa_compile_game.py``.
+    All numbers are little endian and the file is laid out as:
+
+    * header: ``b"PYOA"``, version (u8), flags (u8), card count (u16),
+      string count (u16), pair count (u32)
+    * string table: string count + 1 offsets (u32) into the string pool
+    * card table: card count + 1 indices (u32) of each card's first pair
+    * pairs: key string (u16), kind (u16), value (u16) for every card field
+    * string pool: the UTF-8 text of every distinct string
+
+    The first card count strings are the ``card_id`` of each card, in card order.
+    A pair's value is a string index for :py:const:`KIND_STRING`, a card number for
+    :py:const:`KIND_CARD` (used for ``*_goto_card_id`` fields), or the string index of
+    JSON text for :py:const:`KIND_JSON`. Strings are only read from the file when a
+    card that uses them is displayed. When the :py:const:`FLAG_SETTINGS` flag is set,
+    the string after the card ids is the JSON text of the game's ``settings``.
+
+    :param str filename: the compiled game file to read
+    :param int cache_size: the number of materialized cards to keep around
+    """
+
+    MAGIC = b"PYOA"
+    VERSION = 1
+    HEADER = "<4sBBHHI"
+    PAIR = "<HHH"
+
+    KIND_STRING = 0
+    KIND_CARD = 1
+    KIND_JSON = 2
+
+    FLAG_SETTINGS = 1
+
+    def __init__(self, filename: str, *, cache_size: int = 4) -> None:
+        self._file = open(filename, "rb")
+        header = self._file.read(struct.calcsize(self.HEADER))
+        magic, version, flags, card_count, string_count, pair_count = struct.unpack(
+            self.HEADER, header
+        )
+        if magic != self.MAGIC or version != self.VERSION:
+            self._file.close()
+            raise ValueError("Not a compiled PYOA game: " + filename)
+        self._card_count = card_count
+        self._string_offsets = self._file.read(4 * (string_count + 1))
+        self._card_pairs = self._file.read(4 * (card_count + 1))
+        self._pairs = self._file.read(struct.calcsize(self.PAIR) * pair_count)
+        self._pool_start = self._file.tell()
+        self._keys = {}
+        self._cards = _LRUCache(cache_size)
+        self.settings = {}
+        """The game's ``settings``, empty if it has none"""
+        if flags & self.FLAG_SETTINGS:
+            self.settings = json.loads(self._string(card_count))
+
+    def _string(self, index: int) -> str:
+        start, end = struct.unpack_from("<II", self._string_offsets, 4 * index)
+        self._file.seek(self._pool_start + start)
+        return self._file.read(end - start).decode("utf-8")
+
+    def card_index(self) -> Dict[str, int]:
+        """Build the ``card_id`` to card number map with a single read of the file.
+
+        :return: the card number of every card that has a ``card_id``
+        :rtype: dict(str, int)
+        """
+        offsets = struct.unpack_from(f"<{self._card_count + 1}I", self._string_offsets)
+        self._file.seek(self._pool_start)
+        card_ids = self._file.read(offsets[-1])
+        card_index = {}
+        for card_num in range(self._card_count):
+            card_id = card_ids[offsets[card_num] : offsets[card_num + 1]].decode("utf-8")
+            if card_id:
+                card_index[card_id] = card_num
+        return card_index
+
+    def __len__(self) -> int:
+        return self._card_count
+
+    def __getitem__(self, card_num: int) -> Dict[str, Any]:
+        if card_num < 0:
+            card_num += self._card_count
+        if not 0 <= card_num < self._card_count:
+            raise IndexError("card number out of range")
+        card = self._cards.get(card_num)
+        if card is not None:
+            return card
+        card = {}
+        first, last = struct.unpack_from("<II", self._card_pairs, 4 * card_num)
+        pair_size = struct.calcsize(self.PAIR)
+        for pair in range(first, last):
+            key_index, kind, value = struct.unpack_from(self.PAIR, self._pairs, pair_size * pair)
+            key = self._keys.get(key_index)
+            if key is None:
+                key = self._keys[key_index] = self._string(key_index)
+            if kind == self.KIND_CARD:
+                card[key] = value
+            elif kind == self.KIND_JSON:
+                card[key] = json.loads(self._string(value))
+            else:
+                card[key] = self._string(value)
+        self._cards.put(card_num, card)
+        return card
+
+    def __iter__(self):
+        for card_num in range(self._card_count):
+            yield self[card_num]
+
+    def close(self) -> None:
+        """Close the game file."""
+        self._cards.clear()
+        self._file.close()
+
+
+class _PackSlice:
+    """A read-only file made of one asset in an `AssetPack`. Every slice shares the
+    pack's open file, so opening a slice doesn't touch the filesystem.
+    """
+
+    def __init__(self, pack_file: Any, offset: int, length: int) -> None:
+        self._file = pack_file
+        self._offset = offset
+        self._length = length
+        self._position = 0
+
+    @staticmethod
+    def readable() -> bool:
+        return True
+
+    @staticmethod
+    def seekable() -> bool:
+        return True
+
+    def seek(self, position: int, whence: int = 0) -> int:
+        if whence == 1:
+            position += self._position
+        elif whence == 2:
+            position += self._length
+        self._position = min(max(position, 0), self._length)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self._length - self._position:
+            size = self._length - self._position
+        self._file.seek(self._offset + self._position)
+        data = self._file.read(size)
+        self._position += len(data)
+        return data
+
+    def readinto(self, buffer: bytearray) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        pass  # the pack's file stays open
+
+
+class AssetPack:
+    """A single file holding all of a game's images and sounds, made by
+    ``examples/pyoa_pack_assets.py``. Finding an asset in the pack's index is much
+    faster than looking a file up in a big directory on an SD card.
+
+    The file starts with a header of ``b"PYPK"``, version (u8), reserved (u8) and
+    asset count (u16). Each asset then has an index entry of its offset (u32), length
+    (u32), name length (u8) and UTF-8 name, and the assets follow the index. All
+    numbers are little endian.
+
+    :param str filename: the pack file to read
+    """
+
+    MAGIC = b"PYPK"
+    VERSION = 1
+    HEADER = "<4sBBH"
+    ENTRY = "<IIB"
+
+    def __init__(self, filename: str) -> None:
+        self._file = open(filename, "rb")
+        magic, version, _, count = struct.unpack(
+            self.HEADER, self._file.read(struct.calcsize(self.HEADER))
+        )
+        if magic != self.MAGIC or version != self.VERSION:
+            self._file.close()
+            raise ValueError("Not a PYOA asset pack: " + filename)
+        entry_size = struct.calcsize(self.ENTRY)
+        self._index = {}
+        for _ in range(count):
+            offset, length, name_length = struct.unpack(self.ENTRY, self._file.read(entry_size))
+            self._index[self._file.read(name_length).decode("utf-8")] = (offset, length)
+        # a pack that was made again has a new size or modification time
+        stat = os.stat(filename)
+        self._stamp = f"{stat[6]} {stat[8]}"
+        self._extracted = set()
+        self._caches = set()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def open(self, name: str) -> _PackSlice:
+        """Open an asset as a read-only file.
+
+        :param str name: the filename of the asset
+        :return: a file holding just the asset
+        """
+        offset, length = self._index[name]
+        return _PackSlice(self._file, offset, length)
+
+    def extract(self, name: str, directory: str) -> str:
+        """Copy an asset out into its own file, for things that can only read real
+        files. The copy is kept, so each asset is only extracted once. The directory
+        also holds a ``pack.stamp`` file that identifies the pack, and copies made from
+        a different pack are replaced.
+
+        :param str name: the filename of the asset
+        :param str directory: where to put the copy, it must be writable
+        :return: the path of the copy
+        :rtype: str
+        :raises OSError: if the copy can't be written
+        """
+        path = directory + "/" + name.replace("/", "_")
+        if name in self._extracted:
+            return path
+        offset, length = self._index[name]
+        try:
+            if directory not in self._caches:
+                self._check_cache(directory)
+            try:
+                extracted = os.stat(path)[6] == length
+            except OSError:
+                extracted = False
+            if not extracted:
+                self._file.seek(offset)
+                with open(path, "wb") as asset_file:
+                    while length:
+                        chunk = self._file.read(min(length, 512))
+                        asset_file.write(chunk)
+                        length -= len(chunk)
+        except OSError as err:
+            raise OSError(
+                "Could not extract asset, the cache directory isn't writable: ", path
+            ) from err
+        self._extracted.add(name)
+        return path
+
+    def _check_cache(self, directory: str) -> None:
+        """Make the cache directory if needed, and remove the copies in it if they were
+        extracted from a different pack.
+
+        :param str directory: the cache directory
+        """
+        stamp_path = directory + "/pack.stamp"
+        try:
+            with open(stamp_path) as stamp_file:
+                stamp = stamp_file.read()
+        except OSError:
+            stamp = None
+            try:
+                os.mkdir(directory)
+            except OSError:
+                pass  # it already exists
+        if stamp != self._stamp:
+            for name in self._index:
+                try:
+                    os.remove(directory + "/" + name.replace("/", "_"))
+                except OSError:
+                    pass  # it was never extracted
+            with open(stamp_path, "w") as stamp_file:
+                stamp_file.write(self._stamp)
+        self._caches.add(directory)
+
+    def close(self) -> None:
+        """Close the pack file."""
+        self._file.close()
+
+
+_NAME = "_0123456789"
+_COMPARISONS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<=": lambda a, b: a <= b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    ">": lambda a, b: a > b,
+}
+_KEYWORDS = ("and", "or", "not", "true", "false")
+
+
+def _tokenize(expression: str) -> list:
+    """Split an expression into numbers, names, operators and quoted strings, which
+    are kept as a tuple of a quote and the string.
+    """
+    tokens = []
+    index = 0
+    length = len(expression)
+    while index < length:
+        char = expression[index]
+        start = index
+        if char.isspace():
+            index += 1
+        elif char.isdigit():
+            while index < length and expression[index].isdigit():
+                index += 1
+            tokens.append(int(expression[start:index]))
+        elif char.isalpha() or char == "_":
+            while index < length and (expression[index].isalpha() or expression[index] in _NAME):
+                index += 1
+            tokens.append(expression[start:index])
+        elif char == "'":
+            index = expression.find("'", start + 1) + 1
+            if not index:
+                raise RuntimeError("Unfinished string in expression: ", expression)
+            tokens.append(("'", expression[start + 1 : index - 1]))
+        elif expression[index : index + 2] in _COMPARISONS:
+            tokens.append(expression[index : index + 2])
+            index += 2
+        elif char in "<>+-*()":
+            tokens.append(char)
+            index += 1
+        else:
+            raise RuntimeError("Unexpected character in expression: ", expression)
+    return tokens
+
+
+class _ExpressionCompiler:
+    """Turns an expression into nested closures, so it is only parsed once.
+
+    :param str expression: the expression to compile
+    """
+
+    def __init__(self, expression: str) -> None:
+        self._expression = expression
+        self._tokens = _tokenize(expression)
+        self._position = 0
+
+    def compile(self) -> Callable[[Dict[str, Any]], Any]:
+        """Compile the whole expression.
+
+        :return: a function that evaluates the expression with a dict of variables
+        """
+        function = self._or()
+        if self._position != len(self._tokens):
+            self._fail()
+        return function
+
+    def _fail(self) -> None:
+        raise RuntimeError("Could not understand expression: ", self._expression)
+
+    def _take(self, token: str) -> bool:
+        if self._position < len(self._tokens) and self._tokens[self._position] == token:
+            self._position += 1
+            return True
+        return False
+
+    def _or(self) -> Callable[[Dict[str, Any]], Any]:
+        left = self._and()
+        while self._take("or"):
+            left = lambda v, a=left, b=self._and(): a(v) or b(v)  # noqa: E731
+        return left
+
+    def _and(self) -> Callable[[Dict[str, Any]], Any]:
+        left = self._not()
+        while self._take("and"):
+            left = lambda v, a=left, b=self._not(): a(v) and b(v)  # noqa: E731
+        return left
+
+    def _not(self) -> Callable[[Dict[str, Any]], Any]:
+        if self._take("not"):
+            return lambda v, a=self._not(): not a(v)
+        left = self._sum()
+        if self._position < len(self._tokens):
+            compare = _COMPARISONS.get(self._tokens[self._position])
+            if compare is not None:
+                self._position += 1
+                return lambda v, a=left, b=self._sum(), c=compare: c(a(v), b(v))
+        return left
+
+    def _sum(self) -> Callable[[Dict[str, Any]], Any]:
+        left = self._product()
+        while True:
+            if self._take("+"):
+                left = lambda v, a=left, b=self._product(): a(v) + b(v)  # noqa: E731
+            elif self._take("-"):
+                left = lambda v, a=left, b=self._product(): a(v) - b(v)  # noqa: E731
+            else:
+                return left
+
+    def _product(self) -> Callable[[Dict[str, Any]], Any]:
+        left = self._value()
+        while self._take("*"):
+            left = lambda v, a=left, b=self._value(): a(v) * b(v)  # noqa: E731
+        return left
+
+    def _value(self) -> Callable[[Dict[str, Any]], Any]:
+        if self._take("-"):
+            return lambda v, a=self._value(): -a(v)
+        if self._take("("):
+            inside = self._or()
+            if not self._take(")"):
+                self._fail()
+            return inside
+        if self._position >= len(self._tokens):
+            self._fail()
+        token = self._tokens[self._position]
+        self._position += 1
+        if isinstance(token, tuple):
+            return lambda v, s=token[1]: s
+        if isinstance(token, int):
+            return lambda v, n=token: n
+        if token in {"true", "false"}:
+            return lambda v, b=token == "true": b
+        if token in _KEYWORDS or not (token[0].isalpha() or token[0] == "_"):
+            self._fail()
+        return lambda v, n=token: v.get(n, 0)
+
+
+def compile_expression(expression: str) -> Callable[[Dict[str, Any]], Any]:
+    """Compile an expression used in a game's ``set`` and ``condition`` fields into a
+    function, so it can be evaluated again and again without being parsed.
+
+    Expressions can use whole numbers, ``true`` and ``false``, strings in single
+    quotes, and the names of variables, which are :py:const:`0` until they are set.
+    Numbers can be combined with ``+``, ``-`` and ``*``, anything compared with
+    ``==``, ``!=``, ``<``, ``<=``, ``>`` and ``>=``, and conditions combined with
+    ``and``, ``or`` and ``not``. Brackets group things together. For example
+    ``gold >= 10 and not has_key``.
+
+    :param str expression: the expression
+    :return: a function that takes a dict of the variables and returns the value
+    """
+    return _ExpressionCompiler(expression).compile()
+
+
+def card_expressions(card: Dict[str, Any]) -> List[str]:
+    """Find every expression in a card: the values of ``set`` that are strings, and
+    the ``condition`` of each button and of each of the card's ``texts``.
+
+    :param card: the card
+    :type card: dict(str, str)
+    :return: the expressions
+    :rtype: list(str)
+    """
+    expressions = [value for value in card.get("set", {}).values() if isinstance(value, str)]
+    for _, _, condition in card_choices(card):
+        if condition:
+            expressions.append(condition)
+    for text in card.get("texts", ()):
+        if "condition" in text:
+            expressions.append(text["condition"])
+    return expressions
+
+
+def card_choices(card: Dict[str, Any]) -> List[Tuple[str, Any, Optional[str]]]:
+    """Find the buttons of a card. A card can have a list of any number of
+    ``buttons``, each with a ``text``, a ``goto_card_id`` and optionally a
+    ``condition``, or the original ``button01_text``/``button01_goto_card_id`` and
+    ``button02_text``/``button02_goto_card_id`` fields, with optional
+    ``button01_condition`` and ``button02_condition``. The second button is only shown
+    if the card has a first one.
+
+    :param card: the card
+    :type card: dict(str, str)
+    :return: the text of each button, the ``card_id`` (or, in a compiled game, the
+        card number) it leads to, and the condition for showing it or `None`, in order
+        from left to right
+    :rtype: list(tuple(str, str or int, str or None))
+    """
+    buttons = card.get("buttons", None)
+    if buttons is not None:
+        return [
+            (button.get("text", ""), button.get("goto_card_id", None), button.get("condition"))
+            for button in buttons
+        ]
+    choices = []
+    for number in ("01", "02"):
+        text = card.get("button" + number + "_text", None)
+        if not text:
+            break
+        destination = card.get("button" + number + "_goto_card_id", None)
+        choices.append((text, destination, card.get("button" + number + "_condition", None)))
+    return choices
+
+
+def validate_game(
+    cards: Any, game_directory: Optional[str] = None, *, pack: Optional[AssetPack] = None
+) -> List[Tuple[str, int, Any]]:
+    """Check a game for mistakes without playing it. This takes time in proportion
+    to the number of cards, so it is fine for games with many thousands of cards, and
+    it works on a computer as well as on the board.
+
+    Each problem is a tuple of its kind, the card number it was found on, and a
+    detail. The kinds are:
+
+    * ``duplicate``: the card's ``card_id`` is already used, the detail is the id
+    * ``dangling``: a button or ``auto_advance`` leads to a card that doesn't exist,
+      the detail is the missing ``card_id`` or card number, or `None` if a button
+      doesn't say where it leads
+    * ``missing_asset``: the card's ``background_image`` or ``sound`` file is not in
+      ``game_directory`` or ``pack``, the detail is the filename
+    * ``unreachable``: no path from the first card leads to the card
+    * ``dead_end``: the card has no buttons and doesn't advance
+    * ``bad_expression``: one of the card's ``set`` or ``condition`` expressions
+      can't be compiled, the detail is the expression
+    * ``trap``: the card is in a loop of cards that can never be left, and that
+      doesn't include the opening of the game: the first card and any cards it leads
+      straight on to without a choice, such as a title card. The card with the lowest
+      number in each loop is reported.
+
+    :param cards: the cards of the game, a list or a `LazyCards` or `CompiledCards`
+    :param game_directory: where to look for the images and sounds, they are not
+        checked if not given
+    :type game_directory: str or None
+    :param pack: the game's asset pack, if it has one
+    :type pack: AssetPack or None
+    :return: the problems. Duplicate ids, bad expressions, dangling links and missing
+        assets come first, in card order.
+    :rtype: list(tuple(str, int, str or int or None))
+    """
+    problems = []
+    edges = _card_graph(cards, game_directory, pack, problems)
+    reached = bytearray(len(edges))
+    if edges:
+        reached[0] = 1
+        queue = [0]
+        for card_num in queue:  # the queue grows as new cards are found
+            for destination in edges[card_num]:
+                if not reached[destination]:
+                    reached[destination] = 1
+                    queue.append(destination)
+    for card_num in range(len(edges)):
+        if not reached[card_num]:
+            problems.append(("unreachable", card_num, None))
+    for card_num, card_edges in enumerate(edges):
+        if not card_edges:
+            problems.append(("dead_end", card_num, None))
+    opening = set()
+    card_num = 0
+    while edges and card_num not in opening:
+        opening.add(card_num)
+        if len(edges[card_num]) != 1:
+            break
+        card_num = edges[card_num][0]
+    for card_num in _trapped_loops(edges, opening):
+        problems.append(("trap", card_num, None))
+    return problems
+
+
+def _card_graph(
+    cards: Any,
+    game_directory: Optional[str],
+    pack: Optional[AssetPack],
+    problems: List[Tuple[str, int, Any]],
+) -> List[List[int]]:
+    """Read every card once to find where it leads, adding any duplicate ids, bad
+    expressions, dangling links and missing assets to ``problems``.
+
+    :return: the card numbers each card leads to
+    :rtype: list(list(int))
+    """
+    card_index = {}
+    targets = []
+    assets = {}
+    expressions = {}
+    for card_num, card in enumerate(cards):
+        card_id = card.get("card_id", None)
+        if card_id is not None:
+            if card_id in card_index:
+                problems.append(("duplicate", card_num, card_id))
+            else:
+                card_index[card_id] = card_num
+        for expression in card_expressions(card):
+            if expression not in expressions:
+                try:
+                    compile_expression(expression)
+                    expressions[expression] = True
+                except RuntimeError:
+                    expressions[expression] = False
+            if not expressions[expression]:
+                problems.append(("bad_expression", card_num, expression))
+        card_targets = [target for _, target, _ in card_choices(card)]
+        if card.get("auto_advance", None) is not None:
+            card_targets.append(card_num + 1)
+        targets.append(card_targets)
+        for key in ("background_image", "sound"):
+            filename = card.get(key, None)
+            if not filename or game_directory is None:
+                continue
+            if pack is not None and filename in pack:
+                continue
+            if filename not in assets:
+                try:
+                    os.stat(game_directory + "/" + filename)
+                    assets[filename] = True
+                except OSError:
+                    assets[filename] = False
+            if not assets[filename]:
+                problems.append(("missing_asset", card_num, filename))
+
+    card_count = len(targets)
+    edges = []
+    for card_num, card_targets in enumerate(targets):
+        card_edges = []
+        for target in card_targets:
+            # compiled games and auto advance use card numbers, everything else card ids
+            destination = target if isinstance(target, int) else card_index.get(target, -1)
+            if 0 <= destination < card_count:
+                card_edges.append(destination)
+            else:
+                problems.append(("dangling", card_num, target))
+        edges.append(card_edges)
+    return edges
+
+
+def _trapped_loops(edges: List[List[int]], opening: set) -> List[int]:
+    """Find the loops of cards that can't be left, using Tarjan's strongly connected
+    components algorithm without recursion.
+
+    :param edges: the card numbers each card leads to
+    :type edges: list(list(int))
+    :param set opening: the card numbers of the opening of the game
+    :return: the lowest card number in each loop that doesn't include the opening
+    :rtype: list(int)
+    """
+    card_count = len(edges)
+    order = [-1] * card_count
+    low = [0] * card_count
+    component = [-1] * card_count
+    stack = []
+    traps = []
+    counter = 0
+    for root in range(card_count):
+        if order[root] >= 0:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        work = [(root, 0)]
+        while work:
+            card_num, next_edge = work[-1]
+            if next_edge < len(edges[card_num]):
+                work[-1] = (card_num, next_edge + 1)
+                destination = edges[card_num][next_edge]
+                if order[destination] < 0:
+                    order[destination] = low[destination] = counter
+                    counter += 1
+                    stack.append(destination)
+                    work.append((destination, 0))
+                elif component[destination] < 0:  # still on the stack
+                    low[card_num] = min(low[card_num], order[destination])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[card_num])
+            if low[card_num] == order[card_num]:
+                members = []
+                member = -1
+                while member != card_num:
+                    member = stack.pop()
+                    component[member] = card_num
+                    members.append(member)
+                if _is_trap(edges, members, component, opening):
+                    traps.append(min(members))
+    return sorted(traps)
+
+
+def _is_trap(
+    edges: List[List[int]], members: List[int], component: List[int], opening: set
+) -> bool:
+    """Whether a strongly connected component is a loop that can't be left.
+
+    :param edges: the card numbers each card leads to
+    :type edges: list(list(int))
+    :param members: the card numbers in the component
+    :type members: list(int)
+    :param component: the component each finished card belongs to
+    :type component: list(int)
+    :param set opening: the card numbers of the opening of the game
+    """
+    looped = len(members) > 1
+    for member in members:
+        if member in opening:
+            return False  # going round the whole game again is fine
+        for destination in edges[member]:
+            if component[destination] != component[member]:
+                return False
+            looped = True  # a card that leads to itself is a loop too
+    return looped
+
+
+class BoardBackend:
+    """The hardware of the board the game runs on: its built in display, speaker, and
+    touchscreen or cursor buttons. This is what `PYOA_Graphics` uses by default.
+    """
+
+    def __init__(self) -> None:
+        import audiocore
+        import audioio
+        import board
+        from digitalio import DigitalInOut
+
+        self._wave_file = audiocore.WaveFile
+        self.display = board.DISPLAY
+        self.speaker_enable = DigitalInOut(board.SPEAKER_ENABLE)
+        self.speaker_enable.switch_to_output(False)
+        if hasattr(board, "AUDIO_OUT"):
+            self.audio = audioio.AudioOut(board.AUDIO_OUT)
+        elif hasattr(board, "SPEAKER"):
+            self.audio = audioio.AudioOut(board.SPEAKER)
+        else:
+            raise AttributeError("Board does not have an audio output!")
+        self.touchscreen = None
+        if hasattr(board, "TOUCH_XL"):
+            import adafruit_touchscreen
+
+            self.touchscreen = adafruit_touchscreen.Touchscreen(
+                board.TOUCH_XL,
+                board.TOUCH_XR,
+                board.TOUCH_YD,
+                board.TOUCH_YU,
+                calibration=((5200, 59000), (5800, 57000)),
+                size=(self.display.width, self.display.height),
+            )
+        elif not hasattr(board, "BUTTON_CLOCK"):
+            raise AttributeError("PYOA requires a touchscreen or cursor.")
+
+    def make_cursor(self, root_group: displayio.Group) -> Tuple[Any, Any]:
+        """Create the cursor used on boards without a touchscreen.
+
+        :param displayio.Group root_group: the group to draw the cursor in
+        :return: the cursor and its cursor manager
+        :rtype: tuple(Cursor, CursorManager)
+        """
+        # No need for Cursor Control on the PyPortal
+        from adafruit_cursorcontrol.cursorcontrol import Cursor
+        from adafruit_cursorcontrol.cursorcontrol_cursormanager import CursorManager
+
+        mouse_cursor = Cursor(self.display, display_group=root_group, cursor_speed=8)
+        return mouse_cursor, CursorManager(mouse_cursor)
+
+    def make_wave(self, wav_file: Any, buffer: bytearray) -> Any:
+        """Create a sample that plays a WAV file.
+
+        :param wav_file: the open WAV file
+        :param bytearray buffer: a buffer the sample can use while playing
+        :return: the sample
+        :rtype: audiocore.WaveFile
+        """
+        return self._wave_file(wav_file, buffer)
+
+    @staticmethod
+    def monotonic() -> float:
+        """The time in seconds, for timing fades, inputs and auto advance."""
+        return time.monotonic()
+
+    @staticmethod
+    def sleep(seconds: float) -> None:
+        """Wait for some time.
+
+        :param float seconds: how long to wait
+        """
+        time.sleep(seconds)
+
+
+class TransitionProfiler:
+    """Records how long each phase of displaying a card takes, and how much memory it
+    used. Set `PYOA_Graphics.profiler` to a profiler to start recording.
+
+    Each record is a tuple of the card number, the phase name, the time the phase took
+    in nanoseconds, and the bytes of memory it allocated (always :py:const:`0` when
+    ``gc.mem_free`` is not available). The phases are ``hide``, ``buttons``,
+    ``background``, ``backlight_fade`` (only for the ``fade`` transition), ``text``,
+    ``refresh``, ``sound`` and ``prefetch``, followed by a ``total`` record for the
+    whole card. ``refresh`` includes the steps of a ``wipe`` or ``slide``. When a button is
+    pressed an ``input`` record holds the time from the finger being lifted to the
+    press being acted on. It is measured with the backend's clock, which the
+    `adafruit_pyoa_headless.HeadlessBackend` only simulates, so it can't be compared
+    with the other phases there.
+
+    `counts` holds tuples of the card number, a name and a count. Each card counts its
+    ``refreshes``, which is :py:const:`0` when nothing visible changed.
+    """
+
+    def __init__(self) -> None:
+        self.records = []
+        self.counts = []
+        self._card_num = None
+        self._card_start = 0
+        self._phase_start = 0
+        self._card_memory = 0
+        self._phase_memory = 0
+
+    @staticmethod
+    def _mem_free() -> int:
+        try:
+            return gc.mem_free()
+        except AttributeError:
+            return 0
+
+    def start(self, card_num: int) -> None:
+        """Start timing a card.
+
+        :param int card_num: the index of the card being displayed
+        """
+        self._card_num = card_num
+        self._card_start = self._phase_start = time.monotonic_ns()
+        self._card_memory = self._phase_memory = self._mem_free()
+
+    def mark(self, phase: str) -> None:
+        """Record the time and memory used since the previous phase.
+
+        :param str phase: the name of the phase that just finished
+        """
+        now = time.monotonic_ns()
+        memory = self._mem_free()
+        self.add(phase, now - self._phase_start, self._phase_memory - memory)
+        self._phase_start = now
+        self._phase_memory = memory
+
+    def add(self, phase: str, nanoseconds: int, memory: int = 0) -> None:
+        """Record a measurement for the current card.
+
+        :param str phase: the name of what was measured
+        :param int nanoseconds: how long it took
+        :param int memory: how many bytes of memory it used
+        """
+        self.records.append((self._card_num, phase, nanoseconds, memory))
+
+    def count(self, name: str, value: int) -> None:
+        """Record how many times something happened for the current card.
+
+        :param str name: the name of what was counted
+        :param int value: the count
+        """
+        self.counts.append((self._card_num, name, value))
+
+    def finish(self) -> None:
+        """Record the total time and memory used by the card."""
+        now = time.monotonic_ns()
+        memory = self._mem_free()
+        self.records.append(
+            (self._card_num, "total", now - self._card_start, self._card_memory - memory)
+        )
+
+    def phase_times(self, phase: str) -> List[int]:
+        """Get every recorded time of a phase, from fastest to slowest.
+
+        :param str phase: the name of the phase
+        :return: the times in nanoseconds
+        :rtype: list(int)
+        """
+        return sorted(record[2] for record in self.records if record[1] == phase)
+
+
+class PlaythroughRecorder:
+    """Records the path a player takes through a game, so it can be played back with
+    `PYOA_Graphics.replay`. Set `PYOA_Graphics.recorder` to a recorder to start
+    recording.
+
+    Each record is a tuple of the time in milliseconds since the first card was
+    shown, the card number and the index of the button that was pressed, or
+    `AUTO_ADVANCE` if the card advanced by itself. The most recent ``size`` records
+    are kept in memory. With ``filename`` every record is also added to the end of
+    a file, packed as the time (u32), card number (u16) and button (u8), little
+    endian, so a whole session survives a crash or a reset.
+
+    :param int size: the number of records to keep in memory
+    :param filename: the file to add the records to, on an SD card or writable
+        filesystem
+    :type filename: str or None
+    """
+
+    RECORD = "<IHB"
+    AUTO_ADVANCE = 255
+    """The button of a record for a card that advanced by itself"""
+
+    def __init__(self, size: int = 64, *, filename: Optional[str] = None) -> None:
+        self._record_size = struct.calcsize(self.RECORD)
+        self._buffer = bytearray(size * self._record_size)
+        self._size = size
+        self._next = 0
+        self._start = None
+        self._file = None
+        if filename is not None:
+            self._file = open(filename, "ab")
+
+    def start(self, now: float) -> None:
+        """Note the time the first card was shown, later calls do nothing.
+
+        :param float now: the time in seconds
+        """
+        if self._start is None:
+            self._start = now
+
+    def record(self, now: float, card_num: int, choice: int) -> None:
+        """Record a choice.
+
+        :param float now: the time in seconds, from the same clock as `start`
+        :param int card_num: the card the choice was made on
+        :param int choice: the index of the button that was pressed, or
+            `AUTO_ADVANCE`
+        """
+        self.start(now)
+        milliseconds = int((now - self._start) * 1000)
+        offset = (self._next % self._size) * self._record_size
+        struct.pack_into(self.RECORD, self._buffer, offset, milliseconds, card_num, choice)
+        self._next += 1
+        if self._file is not None:
+            self._file.write(self._buffer[offset : offset + self._record_size])
+            self._file.flush()
+
+    @property
+    def records(self) -> List[Tuple[int, int, int]]:
+        """The records kept in memory, oldest first."""
+        first = max(0, self._next - self._size)
+        return [
+            struct.unpack_from(self.RECORD, self._buffer, (index % self._size) * self._record_size)
+            for index in range(first, self._next)
+        ]
+
+    def close(self) -> None:
+        """Close the file, if there is one."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @classmethod
+    def read(cls, filename: str) -> List[Tuple[int, int, int]]:
+        """Read back the records from a file.
+
+        :param str filename: the file written by a recorder
+        :return: the records, oldest first
+        :rtype: list(tuple(int, int, int))
+        """
+        with open(filename, "rb") as record_file:
+            data = record_file.read()
+        record_size = struct.calcsize(cls.RECORD)
+        # a record cut short by a reset is left out
+        return [
+            struct.unpack_from(cls.RECORD, data, offset)
+            for offset in range(0, len(data) - record_size + 1, record_size)
+        ]
+
+
+class _SaveFile:
+    """A file of a fixed size that can be read and written with slices, like
+    ``microcontroller.nvm``. It is created, filled with zeros, if it doesn't exist,
+    and padded with zeros if it is shorter than ``size``.
+
+    :param str filename: the file to use
+    :param int size: the size of the file in bytes
+    """
+
+    def __init__(self, filename: str, size: int) -> None:
+        try:
+            self._file = open(filename, "r+b")
+        except OSError:
+            with open(filename, "wb") as new_file:
+                new_file.write(bytes(size))
+            self._file = open(filename, "r+b")
+        self._file.seek(0, 2)
+        length = self._file.tell()
+        if length < size:
+            self._file.write(bytes(size - length))
+            self._file.flush()
+        self._size = size
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, index: slice) -> bytes:
+        self._file.seek(index.start)
+        return self._file.read(index.stop - index.start)
+
+    def __setitem__(self, index: slice, data: bytes) -> None:
+        self._file.seek(index.start)
+        self._file.write(data)
+        self._file.flush()
+
+
+class SaveState:
+    """Remembers where the player is, so a game can carry on after the power is
+    turned off. Set `PYOA_Graphics.save_state` to use it.
+
+    Each save is a small binary record written to the next of several slots in turn,
+    so the same bytes of flash aren't rewritten every time and the previous save is
+    never overwritten. A save cut short by a power loss fails its checksum, and the
+    save before it is used instead. Saves are only written when something changed
+    and ``interval`` seconds have passed since the last one, or by `flush` with
+    ``force``.
+
+    A record is a header of ``b"PYSV"``, version (u8), flags (u8), sequence number
+    (u32), size of the game file (u32), card number (u16), history length (u16) and
+    variables length (u16), followed by the history (u16 each), the variables as JSON
+    and a CRC-32 (u32) of everything before it. All numbers are little endian.
+
+    :param storage: where to save, either the filename of a file on an SD card or
+        writable filesystem, or something that can be sliced like a bytearray, such as
+        ``microcontroller.nvm``
+    :type storage: str or bytearray
+    :param int slots: the number of records to take turns writing
+    :param int slot_size: the most bytes a record can use
+    :param int offset: where the slots start in ``storage``
+    :param float interval: the fewest seconds between two writes
+    :param int history_size: the number of most recently visited cards to keep
+    """
+
+    MAGIC = b"PYSV"
+    VERSION = 1
+    HEADER = "<4sBBIIHHH"
+
+    def __init__(
+        self,
+        storage: Any,
+        *,
+        slots: int = 8,
+        slot_size: int = 256,
+        offset: int = 0,
+        interval: float = 30.0,
+        history_size: int = 32,
+    ) -> None:
+        if isinstance(storage, str):
+            storage = _SaveFile(storage, offset + slots * slot_size)
+        if offset + slots * slot_size > len(storage):
+            raise ValueError("Not enough room for the save slots")
+        self._storage = storage
+        self._slots = slots
+        self._slot_size = slot_size
+        self._offset = offset
+        self.interval = interval
+        self._history_size = history_size
+        self.card = 0
+        """The card number of the card being played"""
+        self.history = []
+        """The card numbers of the most recently visited cards, oldest first"""
+        self.variables = {}
+        """Game variables to save along with the card, they must be JSON compatible"""
+        self.game_size = 0
+        """The size of the game file the save belongs to"""
+        self.sequence = 0
+        self._slot = -1
+        self._changed = False
+        self._last_write = None
+
+    def _newest(self) -> Optional[Tuple[int, int, bytes]]:
+        """Find the newest save that is intact, as its slot, sequence number and record,
+        or `None` if there isn't one."""
+        header_size = struct.calcsize(self.HEADER)
+        best = None
+        for slot in range(self._slots):
+            start = self._offset + slot * self._slot_size
+            record = self._storage[start : start + self._slot_size]
+            if len(record) < header_size:
+                continue
+            magic, version, _, sequence, _, _, history_count, variables_length = struct.unpack_from(
+                self.HEADER, record
+            )
+            length = header_size + 2 * history_count + variables_length
+            if magic != self.MAGIC or version != self.VERSION or length + 4 > len(record):
+                continue
+            if struct.unpack_from("<I", record, length)[0] != crc32(record[:length]):
+                continue  # torn by a power loss
+            if best is None or sequence > best[1]:
+                best = (slot, sequence, record)
+        return best
+
+    def load(self) -> bool:
+        """Read the newest save that is intact.
+
+        :return: `True` if a save was found
+        :rtype: bool
+        """
+        best = self._newest()
+        if best is None:
+            return False
+        self._slot, self.sequence, record = best
+        header_size = struct.calcsize(self.HEADER)
+        _, _, _, _, self.game_size, self.card, history_count, variables_length = struct.unpack_from(
+            self.HEADER, record
+        )
+        self.history = list(struct.unpack_from(f"<{history_count}H", record, header_size))
+        variables_start = header_size + 2 * history_count
+        variables = record[variables_start : variables_start + variables_length]
+        self.variables = json.loads(bytes(variables).decode("utf-8")) if variables else {}
+        self._changed = False
+        return True
+
+    def visit(self, card_num: int) -> None:
+        """Note that the player has moved to a card. This doesn't write anything.
+
+        :param int card_num: the card number of the card
+        """
+        if card_num == self.card and self.history:
+            return
+        self.card = card_num
+        self.history.append(card_num)
+        if len(self.history) > self._history_size:
+            self.history.pop(0)
+        self._changed = True
+
+    def changed(self) -> None:
+        """Note that the `variables` have changed, so they are saved next time."""
+        self._changed = True
+
+    def flush(self, now: Optional[float] = None, *, force: bool = False) -> bool:
+        """Write a save if something has changed since the last one and ``interval``
+        seconds have passed, or straight away with ``force``.
+
+        :param now: the time in seconds, from the same clock on every call
+        :type now: float or None
+        :param bool force: If `True` don't wait for ``interval`` to pass
+        :return: `True` if a save was written
+        :rtype: bool
+        :raises RuntimeError: if the variables don't fit in a slot. Nothing is written
+            until something changes again.
+        """
+        if not self._changed:
+            return False
+        if not force and self._last_write is not None and now is not None:
+            if now - self._last_write < self.interval:
+                return False
+        variables = json.dumps(self.variables).encode("utf-8") if self.variables else b""
+        history = self.history
+        header_size = struct.calcsize(self.HEADER)
+        # drop the oldest history to make room for the variables
+        room = (self._slot_size - header_size - len(variables) - 4) // 2
+        if room < 0:
+            self._changed = False  # don't try again until the variables change
+            raise RuntimeError("Save state is too large for a slot: ", len(variables))
+        if len(history) > room:
+            history = history[len(history) - room :]
+        if self._slot == -1:
+            # never loaded, so carry on after any saves already there
+            best = self._newest()
+            if best is not None:
+                self._slot, self.sequence, _ = best
+        self.sequence += 1
+        record = bytearray(
+            struct.pack(
+                self.HEADER,
+                self.MAGIC,
+                self.VERSION,
+                0,
+                self.sequence,
+                self.game_size,
+                self.card,
+                len(history),
+                len(variables),
+            )
+        )
+        record += struct.pack(f"<{len(history)}H", *history)
+        record += variables
+        record += struct.pack("<I", crc32(record))
+        self._slot = (self._slot + 1) % self._slots
+        start = self._offset + self._slot * self._slot_size
+        self._storage[start : start + len(record)] = record
+        self._changed = False
+        self._last_write = now
+        return True
 
-try:  # No need for Cursor Control on the PyPortal
-    from adafruit_cursorcontrol.cursorcontrol import Cursor
-    from adafruit_cursorcontrol.cursorcontrol_cursormanager import CursorManager
-except ImportError:
-    pass
-import audiocore
-import audioio
-import terminalio
-from adafruit_button import Button
-from adafruit_display_text.label import Label
+    def clear(self) -> None:
+        """Forget the player's progress, for starting a new game. The next save
+        replaces the old ones.
+        """
+        self.card = 0
+        self.history = []
+        self.variables = {}
+        self._changed = True
 
-try:
-    from typing import Dict, List, Optional
-except ImportError:
-    pass
 
-__version__ = "0.0.0+auto.0"
-__repo__ = "https://github.com/adafruit/Adafruit_CircuitPython_PYOA.git"
+class GameLibrary:
+    """The games in the directories under one root directory, such as ``/sd/games``,
+    played one at a time with the same `PYOA_Graphics`. Only the names of the game
+    directories are read to find the games, no game is read until it is loaded.
+
+    Switching games releases everything that belongs to the previous game, while the
+    backgrounds and sounds in the `PYOA_Graphics` caches are kept. They are cached by
+    their full path, so images and sounds that several games share, such as
+    ``../common/title.bmp``, are only opened once.
+
+    :param PYOA_Graphics gfx: what to play the games with
+    :param str root: the directory holding a directory for each game
+    """
+
+    def __init__(self, gfx: "PYOA_Graphics", root: str) -> None:
+        self._gfx = gfx
+        self.root = root
+        self.games = []
+        """The names of the game directories, in alphabetical order"""
+        for name in sorted(os.listdir(root)):
+            for game_file in ("/cyoa.pyoa", "/cyoa.json"):
+                try:
+                    os.stat(root + "/" + name + game_file)
+                except OSError:
+                    continue
+                self.games.append(name)
+                break
+        self.current = None
+        """The name of the loaded game, or `None`"""
+
+    def __len__(self) -> int:
+        return len(self.games)
+
+    def directory(self, game: Any) -> str:
+        """Find where a game is stored.
+
+        :param game: the name of the game, or its index in `games`
+        :type game: str or int
+        :return: the game directory
+        :rtype: str
+        """
+        if isinstance(game, int):
+            game = self.games[game]
+        elif game not in self.games:
+            raise RuntimeError("Could not find game: ", game)
+        return self.root + "/" + game
+
+    def load(self, game: Any, **kwargs: Any) -> None:
+        """Unload the current game and load another one.
+
+        :param game: the name of the game, or its index in `games`
+        :type game: str or int
+        :param kwargs: passed on to `PYOA_Graphics.load_game`
+        """
+        directory = self.directory(game)
+        self.unload()
+        self._gfx.load_game(directory, **kwargs)
+        self.current = directory[len(self.root) + 1 :]
+
+    def unload(self) -> None:
+        """Unload the current game, see `PYOA_Graphics.unload_game`."""
+        self._gfx.unload_game()
+        self.current = None
+
+
+class LayoutProfile:
+    """Where the text and buttons of a card go on a display of a certain size. All of
+    it is worked out once, from the width and height of the display, so any display
+    and rotation can be used. The positions of the PyBadge, PyGamer and PyPortal
+    Titano layouts are tuned by hand. Use `for_display` to share one profile between
+    everything using the same size of display.
+
+    Sizes and positions are in display pixels divided by ``scale``, which is what the
+    text and buttons are scaled up by. A game can change any of them with a
+    ``layout`` object in its ``settings``, such as ``{"button_y": 180}``.
+
+    :param int width: the width of the display
+    :param int height: the height of the display
+    :param overrides: the values to use instead of the ones worked out
+    """
+
+    FIELDS = (
+        "scale",
+        "button_width",
+        "button_height",
+        "button_y",
+        "button_margin",
+        "text_x",
+        "text_y",
+        "text_width",
+    )
+    _profiles = {}
+
+    def __init__(self, width: int, height: int, **overrides: int) -> None:
+        for name in overrides:
+            if name not in self.FIELDS:
+                raise RuntimeError("Unknown layout setting: ", name)
+        self.width = width
+        self.height = height
+        self.scale = overrides.get("scale", max(1, min(width, height) // 160))
+        """How much the text and buttons are scaled up by"""
+        # the size of the display in scaled pixels
+        width //= self.scale
+        height //= self.scale
+        values = {
+            "button_width": width * 3 // 8,
+            "button_height": min(width // 8, height // 5),
+            "button_margin": 10,
+            "text_x": max(3, width // 40),
+            "text_y": height * 2 // 5 - 1,
+        }
+        if "scale" not in overrides:
+            values.update(_TUNED_LAYOUTS.get((self.width, self.height), {}))
+        values.update(overrides)
+        if "button_y" not in values:
+            values["button_y"] = height - values["button_height"] - height // 48
+        self.button_width = values["button_width"]
+        """The widest a button can be"""
+        self.button_height = values["button_height"]
+        """The height of each button"""
+        self.button_y = values["button_y"]
+        """The top of the bottom row of buttons"""
+        self.button_margin = values["button_margin"]
+        """The space between buttons, and between the buttons and the edges"""
+        self.text_x = values["text_x"]
+        """The left of the card text"""
+        self.text_y = values["text_y"]
+        """The top of the card text"""
+        self.text_width = values.get("text_width", width - 2 * self.text_x)
+        """How wide the card text can be before it is wrapped"""
+
+    @classmethod
+    def for_display(cls, width: int, height: int) -> "LayoutProfile":
+        """Get the layout for a size of display, working it out the first time.
+
+        :param int width: the width of the display
+        :param int height: the height of the display
+        :return: the layout
+        :rtype: LayoutProfile
+        """
+        profile = cls._profiles.get((width, height))
+        if profile is None:
+            profile = cls._profiles[(width, height)] = cls(width, height)
+        return profile
 
 
 class PYOA_Graphics:
-    """A choose your own adventure game framework."""
+    """A choose your own adventure game framework.
 
-    def __init__(self) -> None:
+    :param int background_cache_size: the number of background images to keep open, so
+        backgrounds that are used again, or that were prefetched for the next cards, can
+        be shown without reading them from the filesystem
+    :param int wrap_cache_size: the number of cards to remember the text layout of
+    :param int sound_cache_size: the number of sounds to keep open, so they can start
+        playing straight away. Each cache size must be at least 1.
+    :param backend: the hardware to use, a `BoardBackend` if not given. Use a
+        `adafruit_pyoa_headless.HeadlessBackend` to run games on a computer.
+    :param float input_interval: the number of seconds between touchscreen readings
+    :param float debounce: the number of seconds the screen must be untouched before a
+        touch counts as finished. Buttons act when the touch finishes.
+    :param int log_level: how much to log, from `LOG_OFF` (the default) to `LOG_TRACE`.
+        Messages are only formatted when their level is enabled.
+    :param log_sink: called with each log message, ``print`` if not given. Use a
+        `RingBufferLog` to keep recent messages in memory instead.
+    :param int max_choices: the most buttons a card can have. This many buttons are
+        made once and shared by every card.
+    """
+
+    def __init__(
+        self,
+        *,
+        background_cache_size: int = 4,
+        wrap_cache_size: int = 16,
+        sound_cache_size: int = 3,
+        backend: Optional[Any] = None,
+        input_interval: float = 0.02,
+        debounce: float = 0.05,
+        log_level: int = LOG_OFF,
+        log_sink: Optional[Callable[[str], None]] = None,
+        max_choices: int = 6,
+    ) -> None:
+        if backend is None:
+            backend = BoardBackend()
+        self._backend = backend
+        self.log_level = log_level
+        self.log_sink = log_sink or print
+        self.profiler = None
+        self.save_state = None
+        self.recorder = None
+        self.variables = {}
+        self._expressions = {}
+        self._resumed = None
         self.root_group = displayio.Group()
-        self._display = board.DISPLAY
+        self._display = backend.display
+        # the layers of a card are grouped so they can slide together
+        self._card_group = displayio.Group()
+        self.root_group.append(self._card_group)
         self._background_group = displayio.Group()
-        self.root_group.append(self._background_group)
+        self._card_group.append(self._background_group)
         self._text_group = displayio.Group()
-        self.root_group.append(self._text_group)
+        self._card_group.append(self._text_group)
         self._button_group = displayio.Group()
-        self.root_group.append(self._button_group)
+        self._card_group.append(self._button_group)
+        self._wipe_group = None
 
-        if self._display.height > 250:
-            self._text_group.scale = 2
-            self._button_group.scale = 2
-
-        self._speaker_enable = DigitalInOut(board.SPEAKER_ENABLE)
-        self._speaker_enable.switch_to_output(False)
-        if hasattr(board, "AUDIO_OUT"):
-            self.audio = audioio.AudioOut(board.AUDIO_OUT)
-        elif hasattr(board, "SPEAKER"):
-            self.audio = audioio.AudioOut(board.SPEAKER)
-        else:
-            raise AttributeError("Board does not have an audio output!")
+        self._speaker_enable = backend.speaker_enable
+        self.audio = backend.audio
 
+        self._fade_from = 0
+        self._fade_to = None
+        self._fade_easing = ease_linear
+        self._fade_start = 0
+        self._fade_duration = 0
         self._background_file = None
+        self._dirty = True
+        self._refreshes = 0
+        self._auto_refresh = True
+        self._background_cache_size = background_cache_size
+        self._backgrounds = _LRUCache(background_cache_size)
+        self._wrap_cache_size = wrap_cache_size
+        self._wrapped = _LRUCache(wrap_cache_size)
+        self._glyph_widths = {}
+        self.layout = None
+        self._text_scale = 1
+        self._layouts = {}
+        self._use_layout(LayoutProfile.for_display(self._display.width, self._display.height))
         self._wavfile = None
+        self._sound_loop = False
+        self._sound_buffer = bytearray(1024)
+        self._sound_cache_size = sound_cache_size
+        self._sounds = _LRUCache(sound_cache_size, on_evict=self._close_sound)
 
         try:
             self._display.auto_brightness = False
@@ -93,112 +1770,401 @@ class PYOA_Graphics:
             pass
         self.backlight_fade(0)
         self._display.root_group = self.root_group
-        self.touchscreen = None
+        self.touchscreen = backend.touchscreen
         self.mouse_cursor = None
-        if hasattr(board, "TOUCH_XL"):
-            self.touchscreen = adafruit_touchscreen.Touchscreen(
-                board.TOUCH_XL,
-                board.TOUCH_XR,
-                board.TOUCH_YD,
-                board.TOUCH_YU,
-                calibration=((5200, 59000), (5800, 57000)),
-                size=(self._display.width, self._display.height),
-            )
-        elif hasattr(board, "BUTTON_CLOCK"):
-            self.mouse_cursor = Cursor(self._display, display_group=self.root_group, cursor_speed=8)
-            self.cursor = CursorManager(self.mouse_cursor)
-        else:
-            raise AttributeError("PYOA requires a touchscreen or cursor.")
+        if self.touchscreen is None:
+            self.mouse_cursor, self.cursor = backend.make_cursor(self.root_group)
         self._gamedirectory = None
         self._gamefilename = None
         self._game = None
+        self.settings = {}
+        self.problems = []
+        self._game_size = 0
+        self._pack = None
+        self._pack_slices = True
+        self._pack_keys = set()
+        self._variants = {}
+        self._card_index = None
+        self._card = None
+        self._card_num = None
+        self._advance_time = None
+        self._next_press_check = 0
+        self._input_interval = input_interval
+        self._debounce = debounce
+        self._input_armed = False
+        self._pressed = False
+        self._press_target = None
+        self._last_touch = -debounce
+        self._release_time = None
+        self.input_latency = 0
+        self._choice = None
+        self._replay = None
+        self._replay_next = 0
+        self._replay_realtime = False
+        self._card_start = 0
+        self._max_choices = max_choices
+        self._button_pool = []
+        # the text asked for on each button, as the button keeps a shortened copy
+        self._button_labels = []
+        self._choices = []
+        self._choice_layout = None
         self._text = None
         self._background_sprite = None
         self._text_font = None
-        self._left_button = None
-        self._right_button = None
-        self._middle_button = None
 
-    def load_game(self, game_directory: str) -> None:
+    def load_game(
+        self,
+        game_directory: str,
+        *,
+        lazy: bool = False,
+        cache_size: int = 4,
+        prewrap: bool = False,
+        validate: bool = False,
+    ) -> None:
         """Load a game.
 
         :param str game_directory: where the game files are stored
+        :param bool lazy: If `True` only parse cards from ``cyoa.json`` when they are
+            displayed instead of keeping the whole game in memory. Use this for large games.
+        :param int cache_size: the number of recently used cards to keep parsed when
+            ``lazy`` is `True` or a compiled game is loaded
+        :param bool prewrap: If `True` word wrap the text of every card now, so no card
+            has to be wrapped when it is displayed. This uses more memory.
+        :param bool validate: If `True` check the whole game with `validate_game` and
+            keep what was found in ``problems``, logging each problem at `LOG_INFO`.
+
+        If the directory has a ``cyoa.pyoa`` file compiled from ``cyoa.json`` it is used
+        instead, which is faster to load and uses less memory. If it has a ``cyoa.pak``
+        `AssetPack`, images and sounds are read from the pack. When bitmaps and sounds
+        can only be read from real files, as on CircuitPython, each asset is extracted
+        into the ``cache`` directory of the game the first time it is used. Backgrounds
+        made for the size of the display by ``pyoa_prepare_backgrounds.py`` are used in
+        place of the originals.
+
+        ``cyoa.json`` is either a list of cards, or an object with the list of cards in
+        ``cards`` and game wide ``settings``, such as the default ``transition``, the
+        starting values of the game's ``variables`` and changes to the `LayoutProfile`
+        for the display in ``layout``.
+
+        Cards can change variables with ``set``, an object of the variables to change
+        and their new values, which are either numbers, ``true`` or ``false``, or an
+        expression as a string. Buttons with a ``condition`` are only shown when it is
+        true, and the first of a card's ``texts`` whose ``condition`` is true replaces
+        its ``text``. See `compile_expression`. Keep an inventory by counting items in
+        variables, such as ``{"set": {"coins": "coins + 5", "has_lamp": true}}``.
         """
+        self.unload_game()
+        try:
+            self._pack = AssetPack(game_directory + "/cyoa.pak")
+            self._pack_slices = True
+        except OSError:
+            pass  # the images and sounds are separate files
         self._gamedirectory = game_directory
         self._text_font = terminalio.FONT
-        # Possible Screen Sizes are:
-        # 320x240 PyPortal and PyPortal Pynt
-        # 160x128 PyBadge and PyGamer
-        # 480x320 PyPortal Titano
-        # 240x240 if we wanted to use HalloWing M4
-
-        # Button Attributes
-        btn_left = 10
-        btn_right = btn_left + 180
-        btn_mid = btn_left + 90
-        button_y = 195
-        button_width = 120
-        button_height = 40
-        if self._display.height < 200:
-            button_y //= 2
-            button_y += 10
-            button_width //= 2
-            button_height //= 2
-            btn_right //= 2
-            btn_mid //= 2
-        elif self._display.height > 250:
-            button_y = (button_y * 3) // 4
-            button_y -= 20
-            button_width = (button_width * 3) // 4
-            button_height = (button_height * 3) // 4
-            btn_right = (btn_right * 3) // 4
-            btn_mid = (btn_right * 3) // 4
-        self._left_button = Button(
-            x=btn_left,
-            y=button_y,
-            width=button_width,
-            height=button_height,
-            label="Left",
-            label_font=self._text_font,
-            style=Button.SHADOWROUNDRECT,
-        )
-        self._right_button = Button(
-            x=btn_right,
-            y=button_y,
-            width=button_width,
-            height=button_height,
-            label="Right",
-            label_font=self._text_font,
-            style=Button.SHADOWROUNDRECT,
-        )
-        self._middle_button = Button(
-            x=btn_mid,
-            y=button_y,
-            width=button_width,
-            height=button_height,
-            label="Middle",
-            label_font=self._text_font,
-            style=Button.SHADOWROUNDRECT,
-        )
-        self._gamefilename = game_directory + "/cyoa.json"
+        self._gamefilename = game_directory + "/cyoa.pyoa"
+        try:
+            os.stat(self._gamefilename)
+        except OSError:
+            self._gamefilename = game_directory + "/cyoa.json"
         try:
-            with open(self._gamefilename) as game_file:
-                self._game = json.load(game_file)
+            if self._gamefilename.endswith(".pyoa"):
+                self._game = CompiledCards(self._gamefilename, cache_size=cache_size)
+                self.settings = self._game.settings
+            elif lazy:
+                self._game = LazyCards(self._gamefilename, cache_size=cache_size)
+                self.settings = self._game.settings
+            else:
+                with open(self._gamefilename) as game_file:
+                    self._game = json.load(game_file)
+                self.settings = {}
+                if isinstance(self._game, dict):
+                    self.settings = self._game.get("settings", {})
+                    self._game = self._game["cards"]
         except OSError as err:
             raise OSError("Could not open game file " + self._gamefilename) from err
+        if self.settings.get("transition", "fade") not in TRANSITIONS:
+            raise RuntimeError("Unknown transition: ", self.settings["transition"])
+        layout = LayoutProfile.for_display(self._display.width, self._display.height)
+        if self.settings.get("layout", None):
+            layout = LayoutProfile(layout.width, layout.height, **self.settings["layout"])
+        self._use_layout(layout)
+        if not self._button_pool:
+            # the rounded corners have a radius of 10, which doesn't fit short buttons
+            style = Button.SHADOWROUNDRECT if layout.button_height >= 22 else Button.SHADOWRECT
+            # the buttons stay in the group and are hidden when not in use
+            for _ in range(self._max_choices):
+                button = Button(
+                    x=0,
+                    y=layout.button_y,
+                    width=layout.button_width,
+                    height=layout.button_height,
+                    label_font=self._text_font,
+                    style=style,
+                )
+                button.hidden = True
+                self._button_group.append(button)
+                self._button_pool.append(button)
+                self._button_labels.append(None)
+        self.variables = dict(self.settings.get("variables", {}))
+        self._expressions = {}
+        self._resumed = None
+        self.problems = []
+        if validate:
+            self.problems = validate_game(self._game, game_directory, pack=self._pack)
+            if self.log_level >= LOG_INFO:
+                for kind, card_num, detail in self.problems:
+                    self._log("Problem with card", card_num, kind, "" if detail is None else detail)
+        self._build_card_index()
+        if isinstance(self._game, list):
+            # compile every expression up front, lazy games compile them when needed
+            for card in self._game:
+                for expression in card_expressions(card):
+                    self._expression(expression)
+        # a save only belongs to this game if the game file hasn't changed size
+        self._game_size = os.stat(self._gamefilename)[6]
+        wrap_cache_size = self._wrap_cache_size
+        if prewrap:
+            wrap_cache_size = max(len(self._game), wrap_cache_size)
+        self._wrapped = _LRUCache(wrap_cache_size)
+        self._glyph_widths = {}
+        if prewrap:
+            for card in self._game:
+                if card.get("text", None):
+                    self._layout_text(card["text"])
+                for text in card.get("texts", ()):
+                    if text.get("text", None):
+                        self._layout_text(text["text"])
 
-    def _fade_to_black(self) -> None:
-        """Turn down the lights."""
-        if self.mouse_cursor:
-            self.mouse_cursor.is_hidden = True
-        self.backlight_fade(0)
-        # turn off background so we can render the text
+    def _use_layout(self, layout: LayoutProfile) -> None:
+        """Switch to a layout, forgetting where the buttons and text went before.
+
+        :param LayoutProfile layout: the layout to use
+        """
+        self.layout = layout
+        self._text_group.scale = layout.scale
+        self._button_group.scale = layout.scale
+        self._text_scale = layout.scale
+        self._layouts = {}
+        self._wrapped = _LRUCache(self._wrap_cache_size)
+
+    def unload_game(self) -> None:
+        """Release the loaded game: clear the screen, close its files and drop its
+        cards, text layouts, compiled expressions and variables, along with any cached
+        backgrounds and sounds that were read from its asset pack. Other cached
+        backgrounds and sounds are kept, as the next game may use them too.
+        `load_game` does this first.
+        """
         self.set_background(None, with_fade=False)
         self.set_text(None, None)
-        for _ in range(len(self._button_group)):
-            self._button_group.pop()
-        if self.mouse_cursor:
-            self.mouse_cursor.is_hidden = False
+        for button in self._button_pool:
+            if not button.hidden:
+                button.hidden = True
+                self._dirty = True
+        self._choices = []
+        self._choice_layout = None
+        self.play_sound(None)
+        if isinstance(self._game, (LazyCards, CompiledCards)):
+            self._game.close()
+        if self._pack is not None:
+            for key in self._pack_keys:
+                self._backgrounds.discard(key)
+                self._sounds.discard(key)
+            self._pack.close()
+            self._pack = None
+        self._pack_keys = set()
+        self._pack_slices = True
+        self._variants = {}
+        self._game = None
+        self._card_index = None
+        self._card = None
+        self._card_num = None
+        self._gamedirectory = None
+        self._gamefilename = None
+        self.settings = {}
+        self.problems = []
+        self.variables = {}
+        self._expressions = {}
+        self._resumed = None
+        self._wrapped = _LRUCache(self._wrap_cache_size)
+        self._glyph_widths = {}
+        gc.collect()
+
+    def _build_card_index(self) -> None:
+        """Map each ``card_id`` to its card number and check every goto target."""
+        if isinstance(self._game, CompiledCards):
+            # the compiler has already checked the card ids and goto targets
+            self._card_index = self._game.card_index()
+            return
+        card_index = {}
+        destinations = set()
+        # one pass, so a lazy game parses each card only once
+        for card_number, card in enumerate(self._game):
+            for _, destination_card_id, _ in card_choices(card):
+                destinations.add(destination_card_id)
+            card_id = card.get("card_id", None)
+            if card_id is None:
+                continue
+            if card_id in card_index:
+                raise RuntimeError("Duplicate 'card_id': ", card_id)
+            card_index[card_id] = card_number
+        for destination_card_id in destinations:
+            if destination_card_id not in card_index:
+                raise RuntimeError(
+                    "Could not find card with matching 'card_id': ", destination_card_id
+                )
+        self._card_index = card_index
+
+    def resume(self) -> int:
+        """Find the card to start the game from: the card the player was on when
+        `save_state` was last saved, or the first card if there is no save for this
+        game. The game isn't read again to do this.
+
+        :return: the card number to start from
+        :rtype: int
+        """
+        save_state = self.save_state
+        if save_state is None or not save_state.load():
+            return 0
+        if save_state.game_size != self._game_size or save_state.card >= len(self._game):
+            if self.log_level >= LOG_INFO:
+                self._log("Ignoring the save from a different game")
+            save_state.clear()
+            return 0
+        if self.log_level >= LOG_INFO:
+            self._log("Resuming at card", save_state.card)
+        self.variables.update(save_state.variables)
+        # the saved variables already include the sets of the saved card
+        self._resumed = save_state.card
+        return save_state.card
+
+    def card_number(self, card_id: str) -> int:
+        """Look up the card number of a card.
+
+        :param str card_id: the ``card_id`` of the card
+        :return: the index of the card in the game
+        :rtype: int
+        """
+        try:
+            return self._card_index[card_id]
+        except KeyError:
+            raise RuntimeError("Could not find card with matching 'card_id': ", card_id) from None
+
+    def _fade_to_black(self) -> None:
+        """Turn down the lights. The layers are left as they are, so only the parts of
+        the next card that differ have to be redrawn.
+        """
+        self.backlight_fade(0)
+
+    def _hide_card(self, transition: str) -> None:
+        """Stop the display updating by itself, so the next card can be built while
+        the current one is still shown.
+
+        :param str transition: how the next card is shown, one of `TRANSITIONS`
+        """
+        self._auto_refresh = self._display.auto_refresh
+        self._display.auto_refresh = False
+        if transition == "wipe":
+            for bar in self._wipe_bars():
+                bar.hidden = False
+                self._dirty = True
+                self._refresh()
+
+    def _show_card(self, transition: str) -> None:
+        """Show the card that was built after `_hide_card`, and let the display update
+        by itself again.
+
+        :param str transition: how the card is shown, one of `TRANSITIONS`
+        """
+        if transition == "wipe":
+            # the card was drawn under the bars, so each step only redraws one bar
+            self._refresh()
+            for bar in self._wipe_bars():
+                bar.hidden = True
+                self._dirty = True
+                self._refresh()
+        elif transition == "slide":
+            width = self._display.width
+            for step in range(_TRANSITION_STEPS - 1, -1, -1):
+                self._card_group.x = width * step // _TRANSITION_STEPS
+                self._dirty = True
+                self._refresh()
+        else:
+            self._refresh()
+        self._display.auto_refresh = self._auto_refresh
+        if self._display.brightness < 1.0:
+            # the screen starts dark, and a fade before this card may have left it so
+            self.backlight_fade(1.0, wait=False)
+
+    def _wipe_bars(self) -> displayio.Group:
+        """The black bars that cover the screen during a wipe, made the first time
+        they are needed.
+        """
+        if self._wipe_group is None:
+            palette = displayio.Palette(1)
+            palette[0] = 0x000000
+            width = self._display.width
+            self._wipe_group = displayio.Group()
+            for step in range(_TRANSITION_STEPS):
+                left = width * step // _TRANSITION_STEPS
+                right = width * (step + 1) // _TRANSITION_STEPS
+                bar = vectorio.Rectangle(
+                    pixel_shader=palette,
+                    width=right - left,
+                    height=self._display.height,
+                    x=left,
+                    y=0,
+                )
+                bar.hidden = True
+                self._wipe_group.append(bar)
+            # above the card, but below the cursor
+            self.root_group.insert(1, self._wipe_group)
+        return self._wipe_group
+
+    def _expression(self, expression: str) -> Callable[[Dict[str, Any]], Any]:
+        """Find the compiled version of an expression, compiling it the first time.
+
+        :param str expression: the expression
+        :return: the compiled expression
+        """
+        function = self._expressions.get(expression, None)
+        if function is None:
+            function = self._expressions[expression] = compile_expression(expression)
+        return function
+
+    def _apply_sets(self, card: Dict[str, Any]) -> bool:
+        """Change the variables listed in the ``set`` of a card, in order.
+
+        :param card: The active card
+        :type card: dict(str, str)
+        :return: `True` if the card set any variables
+        :rtype: bool
+        """
+        sets = card.get("set", None)
+        if not sets:
+            return False
+        variables = self.variables
+        for name, value in sets.items():
+            if isinstance(value, str):
+                variables[name] = self._expression(value)(variables)
+            else:
+                variables[name] = value
+        if self.log_level >= LOG_DEBUG:
+            self._log("Variables:", variables)
+        return True
+
+    def _visible_choices(self, card: Dict[str, Any]) -> List[Tuple[str, Any, Optional[str]]]:
+        """Find the buttons of a card whose condition is true, or that have none.
+
+        :param card: The active card
+        :type card: dict(str, str)
+        :return: the buttons to show
+        :rtype: list(tuple(str, str or int, str or None))
+        """
+        return [
+            choice
+            for choice in card_choices(card)
+            if choice[2] is None or self._expression(choice[2])(self.variables)
+        ]
 
     def _display_buttons(self, card: Dict[str, str]) -> None:
         """Display the buttons of a card.
@@ -206,17 +2172,87 @@ class PYOA_Graphics:
         :param card: The active card
         :type card: dict(str, str)
         """
-        button01_text = card.get("button01_text", None)
-        button02_text = card.get("button02_text", None)
-        self._left_button.label = button01_text
-        self._middle_button.label = button01_text
-        self._right_button.label = button02_text
-        if button01_text and not button02_text:
-            # show only middle button
-            self._button_group.append(self._middle_button)
-        if button01_text and button02_text:
-            self._button_group.append(self._right_button)
-            self._button_group.append(self._left_button)
+        choices = self._visible_choices(card)
+        if len(choices) > len(self._button_pool):
+            raise RuntimeError("Too many buttons on card: ", card.get("card_id", None))
+        self._choices = choices
+        self._choice_layout = self._layout_choices(len(choices)) if choices else None
+        for index, button in enumerate(self._button_pool):
+            if index < len(choices):
+                self._show_button(index, choices[index][0], self._choice_layout[0][index])
+            elif not button.hidden:
+                button.hidden = True
+                self._dirty = True
+
+    def _show_button(self, index: int, text: str, rect: Tuple[int, int, int, int]) -> None:
+        """Unhide a button, only moving it or replacing its label if they have changed.
+        Only a change marks the display as needing a refresh.
+
+        :param int index: The button to show, in the pool of buttons
+        :param str text: The button's label
+        :param rect: Where the button goes, its x, y, width and height in the
+            coordinates of the button group
+        :type rect: tuple(int, int, int, int)
+        """
+        button = self._button_pool[index]
+        x, y, width, height = rect
+        if (button.width, button.height) != (width, height):
+            button.resize(width, height)
+            # a label shortened to fit the old size has to be shortened again
+            self._button_labels[index] = None
+            self._dirty = True
+        if (button.x, button.y) != (x, y):
+            button.x, button.y = x, y
+            self._dirty = True
+        # the button's own label is cut short to fit, so compare with the text asked for
+        if self._button_labels[index] != text:
+            button.label = text
+            self._button_labels[index] = text
+            self._dirty = True
+        if button.hidden:
+            button.hidden = False
+            self._dirty = True
+
+    def _layout_choices(self, count: int) -> Tuple[list, int, int, Tuple[float, int]]:
+        """Work out where the buttons of a card with ``count`` choices go. Buttons fill
+        a row, getting narrower as more are added, until they would be too narrow to
+        read, and then another row is added above. Each layout is only worked out once.
+
+        :param int count: The number of buttons
+        :return: Where each button goes, as its x, y, width and height in the
+            coordinates of the button group, the number of rows and columns, and the
+            distance between columns and between rows
+        :rtype: tuple(list(tuple(int, int, int, int)), int, int, tuple(float, int))
+        """
+        layout = self._layouts.get(count)
+        if layout is not None:
+            return layout
+        margin = self.layout.button_margin
+        row_width = self._display.width // self.layout.scale
+        button_width = self.layout.button_width
+        button_height = self.layout.button_height
+        for rows in range(1, count + 1):
+            columns = -(-count // rows)  # rounded up
+            width = min(button_width, (row_width - (columns + 1) * margin) // columns)
+            if width >= button_width // 2:
+                break
+        rects = []
+        for index in range(count):
+            row, column = divmod(index, columns)
+            if columns == 1:
+                x = (row_width - width) // 2
+            else:
+                # spread out from one edge to the other
+                x = margin + column * (row_width - 2 * margin - width) // (columns - 1)
+            y = self.layout.button_y - (rows - 1 - row) * (button_height + margin)
+            rects.append((x, y, width, button_height))
+        # the average distance between columns and rows, for finding the touched button
+        pitch = (
+            (rects[columns - 1][0] - rects[0][0]) / (columns - 1) if columns > 1 else 1,
+            button_height + margin,
+        )
+        layout = self._layouts[count] = (rects, rows, columns, pitch)
+        return layout
 
     def _display_background_for(self, card: Dict[str, str]) -> None:
         """If there's a background on card, display it.
@@ -233,24 +2269,36 @@ class PYOA_Graphics:
         :type card: dict(str, str)
         """
         text = card.get("text", None)
+        for option in card.get("texts", ()):
+            condition = option.get("condition", None)
+            if condition is None or self._expression(condition)(self.variables):
+                text = option.get("text", None)
+                break
         text_color = card.get("text_color", 0x0)  # default to black
         text_background_color = card.get("text_background_color", None)
         if text:
-            try:
-                text_color = int(text_color)  # parse the JSON string to hex int
-            except ValueError:
-                text_color = 0x0
+            text_color = self._parse_color(text_color, 0x0)
+            text_background_color = self._parse_color(text_background_color, None)
+            self.set_text(text, text_color, background_color=text_background_color)
+        else:
+            self.set_text(None, None)
 
-            try:
-                text_background_color = int(
-                    text_background_color
-                )  # parse the JSON string to hex int
-            except ValueError:
-                text_background_color = None
-            except TypeError:
-                text_background_color = None
+    @staticmethod
+    def _parse_color(color: Any, default: Optional[int]) -> Optional[int]:
+        """Turn a color from a card, such as ``"0x000001"``, into an int.
 
-            self.set_text(text, text_color, background_color=text_background_color)
+        :param color: the color, as a number or a string in any base Python understands
+        :param default: what to use if there isn't a color or it can't be read
+        :return: the color
+        :rtype: int or None
+        """
+        if isinstance(color, int):
+            return color
+        try:
+            # base 0 reads "0x" prefixes, as int() does on MicroPython but not CPython
+            return int(color, 0)
+        except (TypeError, ValueError):
+            return default
 
     def _play_sound_for(self, card: Dict[str, str]) -> None:
         """If there's a sound, start playing it.
@@ -262,84 +2310,389 @@ class PYOA_Graphics:
         loop = card.get("sound_repeat", False)
         if sound:
             loop = loop == "True"
-            print("Loop:", loop)
+            if self.log_level >= LOG_DEBUG:
+                self._log("Loop:", loop)
             self.play_sound(sound, wait_to_finish=False, loop=loop)
 
-    def _wait_for_press(self, card: Dict[str, str]) -> str:
-        """Wait for a button to be pressed.
+    def _card_destinations(self, card: Dict[str, str]) -> List[int]:
+        """Find the card numbers that a card can lead to with the buttons it shows.
 
         :param card: The active card
         :type card: dict(str, str)
-        :return: The id of the destination card
-        :rtype: str
+        :return: The card numbers of the possible next cards
+        :rtype: list(int)
         """
-        button01_text = card.get("button01_text", None)
-        button02_text = card.get("button02_text", None)
-        point_touched = None
-        while True:
-            if self.touchscreen is not None:
-                point_touched = self.touchscreen.touch_point
-            else:
-                self.cursor.update()
-                if self.cursor.is_clicked is True:
-                    point_touched = self.mouse_cursor.x, self.mouse_cursor.y
-            if point_touched is not None:
-                point_touched = (
-                    point_touched[0] // self._button_group.scale,
-                    point_touched[1] // self._button_group.scale,
-                )
-                print("touch: ", point_touched)
-                if button01_text and not button02_text:
-                    # showing only middle button
-                    if self._middle_button.contains(point_touched):
-                        print("Middle button")
-                        return card.get("button01_goto_card_id", None)
-                if button01_text and button02_text:
-                    if self._left_button.contains(point_touched):
-                        print("Left button")
-                        return card.get("button01_goto_card_id", None)
-                    if self._right_button.contains(point_touched):
-                        print("Right button")
-                        return card.get("button02_goto_card_id", None)
-            time.sleep(0.1)
+        return [
+            self._destination_number(destination)
+            for _, destination, _ in self._choices
+            if destination is not None
+        ]
+
+    def _destination_number(self, destination: Any) -> int:
+        """Turn a goto target into a card number.
+
+        :param destination: a ``card_id``, or a card number from a compiled game
+        :type destination: str or int
+        :return: the card number of the destination
+        :rtype: int
+        """
+        if isinstance(destination, int):
+            return destination  # compiled games store the card number
+        return self.card_number(destination)
+
+    def _prefetch_after(self, card_num: int) -> None:
+        """Open the backgrounds and sounds of the cards that can follow a card.
+
+        :param int card_num: the index of the active card
+        """
+        card = self._game[card_num]
+        if card.get("auto_advance", None) is not None:
+            destinations = [card_num + 1] if card_num + 1 < len(self._game) else []
+        else:
+            destinations = self._card_destinations(card)
+        backgrounds = sounds = 0
+        for destination in destinations:
+            next_card = self._game[destination]
+            filename = next_card.get("background_image", None)
+            # leave room in the caches for the background and sound in use now
+            if filename and backgrounds < self._background_cache_size - 1:
+                self._load_background(filename)
+                backgrounds += 1
+            filename = next_card.get("sound", None)
+            if filename and sounds < self._sound_cache_size - 1:
+                self._load_sound(filename)
+                sounds += 1
+
+    def _hit_test(self, point: Tuple[int, int]) -> Optional[int]:
+        """Find the button at a point on the screen. The buttons are laid out in a
+        grid, so this takes the same time however many buttons there are.
+
+        :param point: The point, in display pixels
+        :type point: tuple(int, int)
+        :return: The index of the button in the card's choices, or `None` if there is
+            no button
+        :rtype: int or None
+        """
+        if self._choice_layout is None:
+            return None
+        rects, rows, columns, pitch = self._choice_layout
+        # touches are in screen coordinates, the buttons in button group coordinates
+        scale = self._button_group.scale
+        x, y = point[0] / scale, point[1] / scale
+        # count the columns and rows from the middle of the first button
+        left, top, width, height = rects[0]
+        column = min(max(round((x - left - width / 2) / pitch[0]), 0), columns - 1)
+        row = min(max(round((y - top - height / 2) / pitch[1]), 0), rows - 1)
+        index = row * columns + column
+        if index >= len(rects):
+            return None
+        left, top, width, height = rects[index]
+        if left <= x <= left + width and top <= y <= top + height:
+            return index
+        return None
+
+    def _check_press(self, card: Dict[str, str], now: float) -> Optional[str]:
+        """Take one input sample and check whether a button has been pressed.
+
+        :param card: The active card
+        :type card: dict(str, str)
+        :param float now: The time of the sample
+        :return: The id of the destination card, or `None` if no button was pressed
+        :rtype: str or None
+        """
+        if self._replay is not None:
+            choice = self._replay_choice(now)
+        elif self.touchscreen is None:
+            choice = self._check_cursor()
+        else:
+            choice = self._check_touch(now)
+        if choice is None:
+            return None
+        self._choice = choice
+        text, destination, _ = self._choices[choice]
+        if self.log_level >= LOG_DEBUG:
+            self._log("Pressed", text, f"{self.input_latency:0.3f} s after release")
+        return destination
+
+    def replay(self, records: List[Tuple[int, int, int]], *, realtime: bool = False) -> int:
+        """Play back the choices recorded by a `PlaythroughRecorder` instead of reading
+        the touchscreen, then carry on as usual with `display_card`, or `start_card`
+        and `update`, from the card returned. Once every record has been played back
+        the touchscreen is read again. The game variables start again from their
+        initial values, as they were when the recording began.
+
+        :param records: the records to play back, from `PlaythroughRecorder.records`
+            or `PlaythroughRecorder.read`
+        :type records: list(tuple(int, int, int))
+        :param bool realtime: If `True` wait as long as the player did on each card,
+            otherwise make each choice, and advance cards that advance by themselves,
+            straight away
+        :return: the card number to start from
+        :rtype: int
+        """
+        self._replay = list(records) or None
+        self._replay_next = 0
+        self.variables = dict(self.settings.get("variables", {}))
+        self._resumed = None
+        self._replay_realtime = realtime
+        return records[0][1] if records else 0
+
+    def _replay_record(self, auto_advance: bool = False) -> Tuple[int, int, int]:
+        """Get the next record to play back, checking it belongs to the current card."""
+        record = self._replay[self._replay_next]
+        if record[1] != self._card_num or auto_advance != (
+            record[2] == PlaythroughRecorder.AUTO_ADVANCE
+        ):
+            raise RuntimeError("Replay went a different way at card: ", self._card_num)
+        return record
+
+    def _replay_advance(self, now: float, auto_advance: bool = False) -> bool:
+        """Move on to the next record once its time has come.
+
+        :param float now: the time
+        :param bool auto_advance: whether the card is advancing by itself
+        :return: `True` if the record was used
+        :rtype: bool
+        """
+        milliseconds = self._replay_record(auto_advance)[0]
+        if self._replay_realtime and self._replay_next:
+            wait = milliseconds - self._replay[self._replay_next - 1][0]
+            if (now - self._card_start) * 1000 < wait:
+                return False
+        self._replay_next += 1
+        if self._replay_next == len(self._replay):
+            self._replay = None  # back to the touchscreen
+        return True
+
+    def _replay_choice(self, now: float) -> Optional[int]:
+        """Make the recorded choice for the current card.
+
+        :param float now: the time
+        :return: The index of the recorded button, or `None` if it isn't time yet
+        :rtype: int or None
+        """
+        choice = self._replay_record()[2]
+        if choice >= len(self._choices):
+            raise RuntimeError("Replay pressed a button that isn't there on card: ", self._card_num)
+        following = self._replay_next + 1
+        if following < len(self._replay) and self._replay[following][1] != (
+            self._destination_number(self._choices[choice][1])
+        ):
+            raise RuntimeError("Replay went a different way at card: ", self._card_num)
+        if not self._replay_advance(now):
+            return None
+        self.input_latency = 0
+        return choice
+
+    def _check_cursor(self) -> Optional[int]:
+        """Check for a click with the cursor.
+
+        :return: The index of the clicked button, or `None` if no button was clicked
+        :rtype: int or None
+        """
+        self.cursor.update()
+        if self.cursor.is_clicked is not True:
+            return None
+        # cursor clicks are already debounced, so act on them straight away
+        self.input_latency = 0
+        return self._hit_test((self.mouse_cursor.x, self.mouse_cursor.y))
+
+    def _check_touch(self, now: float) -> Optional[int]:
+        """Read the touchscreen and track the current touch.
+
+        A touch counts once the finger has been lifted for the debounce time, and only
+        if it started and ended on the same button. A finger still on the screen from
+        the previous card is ignored until it is lifted.
+
+        :param float now: The time of the reading
+        :return: The index of the pressed button, or `None` if no button was pressed
+        :rtype: int or None
+        """
+        point_touched = self.touchscreen.touch_point
+        if point_touched is not None:
+            if self.log_level >= LOG_TRACE:
+                self._log("touch:", point_touched)
+            self._last_touch = now
+            self._release_time = None
+            if self._input_armed:
+                choice = self._hit_test(point_touched)
+                if not self._pressed:
+                    self._pressed = True
+                    self._press_target = choice
+                elif choice != self._press_target:
+                    self._press_target = None  # slid off the button
+            return None
+
+        if self._release_time is None:
+            self._release_time = now
+        if now - self._last_touch < self._debounce:
+            return None
+        self._input_armed = True
+        choice = self._press_target if self._pressed else None
+        self._pressed = False
+        if choice is not None:
+            self.input_latency = now - self._release_time
+        return choice
 
     def display_card(self, card_num: int) -> int:
         """Display and handle input on a card.
 
+        This blocks until the player has chosen the next card. Use `start_card` and
+        `update` instead to keep other code running while the card is displayed.
+
         :param int card_num: the index of the card to process
         :return: the card number of the selected card
         :rtype: int
         """
+        self.start_card(card_num)
+        while True:
+            next_card = self.update()
+            if next_card is not None:
+                return next_card
+            self._backend.sleep(0.01)
+
+    def start_card(self, card_num: int) -> None:
+        """Display a card without waiting for the player. Call `update` afterwards
+        until it returns the next card number.
+
+        :param int card_num: the index of the card to display
+        """
         card = self._game[card_num]
-        print(card)
-        print("*" * 32)
-        print("****{:^24s}****".format(card["card_id"]))
-        print("*" * 32)
+        if self.log_level >= LOG_INFO:
+            self._log("*" * 32)
+            self._log("****{:^24s}****".format(str(card.get("card_id", card_num))))
+            self._log("*" * 32)
+        if self.log_level >= LOG_DEBUG:
+            self._log(card)
 
-        self._fade_to_black()
+        profiler = self.profiler
+        if profiler:
+            profiler.start(card_num)
+        self._refreshes = 0
+        if card_num == self._resumed:
+            variables_changed = False
+        else:
+            variables_changed = self._apply_sets(card)
+        self._resumed = None
+        transition = card.get("transition", self.settings.get("transition", "fade"))
+        if transition not in TRANSITIONS:
+            raise RuntimeError("Unknown transition: ", transition)
+        if transition == "fade":
+            self._fade_to_black()
+        else:
+            self._hide_card(transition)
+        self._mark("hide")
         self._display_buttons(card)
+        self._mark("buttons")
         self._display_background_for(card)
-        self.backlight_fade(1.0)
+        self._mark("background")
+        if transition == "fade":
+            # fade up while the rest of the card is built, update finishes the fade
+            self.backlight_fade(1.0, wait=False)
+            self._mark("backlight_fade")
         self._display_text_for(card)
-        self._display.refresh(target_frames_per_second=60)
+        self._mark("text")
+        if transition == "fade":
+            self._refresh()
+        else:
+            self._show_card(transition)
+        self._mark("refresh")
 
         self._play_sound_for(card)
+        self._mark("sound")
+        self._prefetch_after(card_num)
+        self._mark("prefetch")
+        if profiler:
+            profiler.count("refreshes", self._refreshes)
+            profiler.finish()
+        if self.save_state:
+            self.save_state.game_size = self._game_size
+            self.save_state.variables = self.variables
+            self.save_state.visit(card_num)
+            if variables_changed:
+                self.save_state.changed()
 
+        self._card_num = card_num
+        self._card = card
+        self._advance_time = None
+        self._next_press_check = 0
+        # a finger still down from the previous card has to be lifted first
+        now = self._backend.monotonic()
+        self._card_start = now
+        if self.recorder:
+            self.recorder.start(now)
+        self._input_armed = now - self._last_touch >= self._debounce
+        self._pressed = False
         auto_adv = card.get("auto_advance", None)
         if auto_adv is not None:
             auto_adv = float(auto_adv)
-            print(f"Auto advancing after {auto_adv:0.1f} seconds")
-            time.sleep(auto_adv)
-            return card_num + 1
+            if self.log_level >= LOG_DEBUG:
+                self._log(f"Auto advancing after {auto_adv:0.1f} seconds")
+            if self._replay is not None and not self._replay_realtime:
+                auto_adv = 0
+            self._advance_time = now + auto_adv
+
+    def _log(self, *items: Any) -> None:
+        """Send a message to the log sink. Check `log_level` before calling this, so
+        nothing is formatted when logging is off.
+        """
+        self.log_sink(" ".join(str(item) for item in items))
+
+    def _mark(self, phase: str) -> None:
+        """Tell the profiler, if there is one, that a phase of displaying a card is done.
+
+        :param str phase: the name of the phase
+        """
+        if self.profiler:
+            self.profiler.mark(phase)
 
-        destination_card_id = self._wait_for_press(card)
+    def update(self) -> Optional[int]:
+        """Handle the card started by `start_card` without blocking. Call this
+        regularly from your main loop.
 
-        self.play_sound(None)  # stop playing any sounds
-        for card_number, card_struct in enumerate(self._game):
-            if card_struct.get("card_id", None) == destination_card_id:
-                return card_number  # found the matching card!
-        # eep if we got here something went wrong
-        raise RuntimeError("Could not find card with matching 'card_id': ", destination_card_id)
+        :return: the card number of the next card once it is known, otherwise `None`
+        :rtype: int or None
+        """
+        self._update_fade()
+        self._update_sound()
+        if self.save_state:
+            try:
+                self.save_state.flush(self._backend.monotonic())
+            except RuntimeError as err:
+                # keep playing, the previous save is still there
+                if self.log_level >= LOG_INFO:
+                    self._log("Couldn't save:", err)
+        if self._card is None:
+            return None
+        now = self._backend.monotonic()
+        next_card = None
+        if self._advance_time is not None:
+            if now >= self._advance_time and (
+                self._replay is None or self._replay_advance(now, True)
+            ):
+                self._choice = PlaythroughRecorder.AUTO_ADVANCE
+                next_card = self._card_num + 1
+        elif now >= self._next_press_check:
+            self._next_press_check = now + self._input_interval
+            destination_card_id = self._check_press(self._card, now)
+            if destination_card_id is not None:
+                if self.profiler:
+                    self.profiler.add("input", int(self.input_latency * 1_000_000_000))
+                # stop playing any sounds, the next card turns off the speaker if it is silent
+                self.audio.stop()
+                self._sound_loop = False
+                next_card = self._destination_number(destination_card_id)
+        if next_card is not None:
+            if self.recorder:
+                self.recorder.record(now, self._card_num, self._choice)
+            self._card = None
+        return next_card
+
+    def _update_sound(self) -> None:
+        """Turn off the speaker once a sound has finished."""
+        if self._wavfile and not self._sound_loop and not self.audio.playing:
+            self._wavfile = None
+            self._speaker_enable.value = False
 
     def play_sound(
         self, filename: Optional[str], *, wait_to_finish: bool = True, loop: bool = False
@@ -352,32 +2705,82 @@ class PYOA_Graphics:
         :param bool wait_to_finish: Whether playing the sound should block
         :param bool loop: Whether the sound should loop
         """
-        self._speaker_enable.value = False
         self.audio.stop()
-        if self._wavfile:
-            self._wavfile.close()
-            self._wavfile = None
-
         if not filename:
-            return  # nothing more to do, just stopped
-        filename = self._gamedirectory + "/" + filename
-        print("Playing sound", filename)
-        self._display.refresh(target_frames_per_second=60)
-        try:
-            self._wavfile = open(filename, "rb")
-        except OSError as err:
-            raise OSError("Could not locate sound file", filename) from err
-
-        wavedata = audiocore.WaveFile(self._wavfile)
+            # nothing more to do, just stopped
+            self._wavfile = None
+            self._speaker_enable.value = False
+            return
+        if self.log_level >= LOG_DEBUG:
+            self._log("Playing sound", filename)
+        self._wavfile = self._load_sound(filename)
+        self._sound_loop = loop
+        # the speaker stays on between sounds, so switching sounds doesn't pop
         self._speaker_enable.value = True
-        self.audio.play(wavedata, loop=loop)
+        self.audio.play(self._wavfile, loop=loop)
         if loop or not wait_to_finish:
             return
         while self.audio.playing:
-            pass
-        self._wavfile.close()
-        self._wavfile = None
-        self._speaker_enable.value = False
+            # let a fade carry on, and give the CPU a rest between checks
+            self._update_fade()
+            self._backend.sleep(0.01)
+        self._update_sound()
+
+    def _load_sound(self, filename: str) -> Any:
+        """Get the WaveFile for a sound, opening the file only if it isn't cached.
+
+        :param str filename: The filename of the sound
+        :return: The sound, ready to play
+        :rtype: audiocore.WaveFile
+        """
+        key = _join_path(self._gamedirectory, filename)
+        sound = self._sounds.get(key)
+        if sound is None:
+            if self._pack_slices and self._pack is not None and filename in self._pack:
+                wav_file = self._pack.open(filename)
+                try:
+                    sound = (wav_file, self._backend.make_wave(wav_file, self._sound_buffer))
+                    self._pack_keys.add(key)
+                except TypeError:
+                    self._pack_slices = False  # only real files can be played
+            if sound is None:
+                path = self._asset_path(filename)
+                try:
+                    wav_file = open(path, "rb")
+                except OSError as err:
+                    raise OSError("Could not locate sound file", path) from err
+                sound = (wav_file, self._backend.make_wave(wav_file, self._sound_buffer))
+            self._sounds.put(key, sound)
+        return sound[1]
+
+    def _asset_path(self, filename: str) -> str:
+        """Where to find an image or sound as a separate file, extracting it from the
+        asset pack if it is in there. If the cache can't be written, such as on a board
+        whose filesystem is read-only, the file next to the game is used instead.
+
+        :param str filename: The filename of the asset
+        :return: The path of the file
+        :rtype: str
+        """
+        path = self._gamedirectory + "/" + filename
+        if self._pack is not None and filename in self._pack:
+            try:
+                return self._pack.extract(filename, self._gamedirectory + "/cache")
+            except OSError:
+                loose = True
+                try:
+                    os.stat(path)
+                except OSError:
+                    loose = False
+                if not loose:
+                    raise  # the asset is only in the pack
+        return path
+
+    @staticmethod
+    def _close_sound(sound: Tuple[Any, Any]) -> None:
+        """Release a sound that has been dropped from the cache."""
+        sound[1].deinit()
+        sound[0].close()
 
     def set_text(
         self,
@@ -394,31 +2797,141 @@ class PYOA_Graphics:
         :param background_color: the background color of the text
         :type background_color: int or None
         """
-        if self._text_group:
-            self._text_group.pop()
         if not text or not color:
+            if self._text is not None and not self._text.hidden:
+                self._text.hidden = True
+                self._dirty = True
             return  # nothing to do!
-        text_wrap = 37
-        if self._display.height < 130:
-            text_wrap = 25
-        text = self.wrap_nicely(text, text_wrap)
-        text = "\n".join(text)
-        print("Set text to", text, "with color", hex(color))
-        text_x = 8
-        text_y = 95
-        if self._display.height < 130:
-            text_x = 3
-            text_y = 38
-        elif self._display.height > 250:
-            text_y = 50
+        text, scale = self._layout_text(text)
+        if self.log_level >= LOG_DEBUG:
+            self._log("Set text to", text, "with color", hex(color))
+        text_x, text_y = self.layout.text_x, self.layout.text_y
         if text:
-            self._text = Label(self._text_font, text=str(text))
-            self._text.x = text_x
-            self._text.y = text_y
-            self._text.color = color
-            if background_color:
-                self._text.background_color = background_color
-            self._text_group.append(self._text)
+            # one label is reused for every card, only changing what is different
+            background_color = background_color or None
+            label = self._text
+            if label is None:
+                label = self._text = Label(self._text_font, text=str(text))
+                self._text_group.append(label)
+                self._dirty = True
+            elif label.text != text:
+                label.text = str(text)
+                self._dirty = True
+            # text that was shrunk to fit keeps its position on the screen
+            position = (text_x * self._text_scale // scale, text_y * self._text_scale // scale)
+            if self._text_group.scale != scale or (label.x, label.y) != position:
+                self._text_group.scale = scale
+                label.x, label.y = position
+                self._dirty = True
+            if label.color != color:
+                label.color = color
+                self._dirty = True
+            if label.background_color != background_color:
+                label.background_color = background_color
+                self._dirty = True
+            if label.hidden:
+                label.hidden = False
+                self._dirty = True
+
+    def _layout_text(self, text: str) -> Tuple[str, int]:
+        """Word wrap card text to fit between the edges of the display and the buttons,
+        reusing earlier results.
+
+        If the text has too many lines it is laid out again at a smaller scale, and
+        if it still doesn't fit the extra lines are cut off and the last line shown
+        ends with ``...``.
+
+        :param str text: The text to wrap
+        :return: The wrapped lines joined with newlines, and the text group scale to
+            show them at
+        :rtype: tuple(str, int)
+        """
+        buttons_top = self.layout.button_y
+        if self._choice_layout is not None:
+            buttons_top = self._choice_layout[0][0][1]  # cards with many buttons use more rows
+        key = text if buttons_top == self.layout.button_y else (text, buttons_top)
+        layout = self._wrapped.get(key)
+        if layout is not None:
+            return layout
+        # the buttons and the text have the same scale until the text is shrunk
+        bottom = buttons_top
+        line_height = int(self._text_font.get_bounding_box()[1] * 1.25)
+        for scale in range(self._text_scale, 0, -1):
+            # sizes in the coordinates of the text group at this scale
+            top = self.layout.text_y * self._text_scale // scale
+            max_width = self.layout.text_width * self._text_scale // scale
+            text_height = bottom * self._text_scale // scale - top - line_height // 2
+            max_lines = text_height // line_height + 1
+            lines = self.wrap_to_width(text, max_width)
+            if len(lines) <= max_lines:
+                break
+        else:
+            if self.log_level >= LOG_INFO:
+                self._log("Text cut off after", max_lines, "of", len(lines), "lines")
+            lines = lines[:max_lines]
+            lines[-1] = self._ellipsize(lines[-1], max_width)
+        layout = ("\n".join(lines), scale)
+        self._wrapped.put(key, layout)
+        return layout
+
+    def _ellipsize(self, line: str, max_width: int) -> str:
+        """Mark a line as cut short with ``...``, dropping words until it fits.
+
+        :param str line: The last line that fits
+        :param int max_width: The widest a line may be, in pixels
+        :return: The line ending with ``...``
+        :rtype: str
+        """
+        dots_width = 3 * self._glyph_width(".")
+        words = line.split(" ")
+        while words:
+            line = " ".join(words)
+            width = 0
+            for char in line:
+                width += self._glyph_width(char)
+            if width + dots_width <= max_width:
+                return line + "..."
+            words.pop()
+        return "..."
+
+    def _glyph_width(self, char: str) -> int:
+        """How far a character moves the text along, in pixels.
+
+        :param str char: The character to measure
+        """
+        width = self._glyph_widths.get(char)
+        if width is None:
+            glyph = self._text_font.get_glyph(ord(char))
+            width = glyph.shift_x if glyph else 0
+            self._glyph_widths[char] = width
+        return width
+
+    def wrap_to_width(self, string: str, max_width: int) -> List[str]:
+        """Word wrap text so every line fits a width in pixels, measured with the
+        game's font.
+
+        :param str string: The text to be wrapped.
+        :param int max_width: The widest a line may be, in pixels.
+        :return: The list of lines
+        :rtype: list(str)
+        """
+        space_width = self._glyph_width(" ")
+        the_lines = []
+        for paragraph in string.split("\n"):
+            line_words = []
+            line_width = -space_width  # there's no space before the first word
+            for word in paragraph.split(" "):
+                word_width = 0
+                for char in word:
+                    word_width += self._glyph_width(char)
+                if line_words and line_width + space_width + word_width > max_width:
+                    the_lines.append(" ".join(line_words))
+                    line_words = []
+                    line_width = -space_width
+                line_words.append(word)
+                line_width += space_width + word_width
+            the_lines.append(" ".join(line_words))
+        return the_lines
 
     def set_background(self, filename: Optional[str], *, with_fade: bool = True) -> None:
         """The background image to a bitmap file.
@@ -428,40 +2941,136 @@ class PYOA_Graphics:
         :param bool with_fade: If `True` fade out the backlight while loading the new background
             and fade in the backlight once completed.
         """
-        print("Set background to", filename)
+        if filename == self._background_file:
+            return  # already showing, so there is nothing to redraw
+        if self.log_level >= LOG_DEBUG:
+            self._log("Set background to", filename)
         if with_fade:
             self.backlight_fade(0)
         if self._background_group:
             self._background_group.pop()
+        self._background_file = None
+        self._dirty = True
 
         if filename:
-            background = displayio.OnDiskBitmap(self._gamedirectory + "/" + filename)
-            self._background_sprite = displayio.TileGrid(
-                background,
-                pixel_shader=background.pixel_shader,
-            )
+            self._background_sprite = self._load_background(filename)
             self._background_group.append(self._background_sprite)
+            self._background_file = filename
         if with_fade:
-            self._display.refresh(target_frames_per_second=60)
+            self._refresh()
             self.backlight_fade(1.0)
 
-    def backlight_fade(self, to_light: float) -> None:
+    def _refresh(self) -> None:
+        """Refresh the display, but only if something visible has changed since the
+        last refresh. displayio only redraws the areas of the layers that changed.
+        """
+        if not self._dirty:
+            return
+        self._dirty = False
+        self._refreshes += 1
+        self._display.refresh(target_frames_per_second=60)
+
+    def _load_background(self, filename: str) -> displayio.TileGrid:
+        """Get the TileGrid for a background, opening the bitmap only if it isn't cached.
+
+        :param str filename: The filename of the background
+        :return: The TileGrid showing the background
+        :rtype: displayio.TileGrid
+        """
+        filename = self._background_variant(filename)
+        key = _join_path(self._gamedirectory, filename)
+        sprite = self._backgrounds.get(key)
+        if sprite is None:
+            background = None
+            if self._pack_slices and self._pack is not None and filename in self._pack:
+                try:
+                    background = displayio.OnDiskBitmap(self._pack.open(filename))
+                    self._pack_keys.add(key)
+                except TypeError:
+                    self._pack_slices = False  # only real files can be read
+            if background is None:
+                background = displayio.OnDiskBitmap(self._asset_path(filename))
+            sprite = displayio.TileGrid(
+                background,
+                pixel_shader=background.pixel_shader,
+            )
+            self._backgrounds.put(key, sprite)
+        return sprite
+
+    def _background_variant(self, filename: str) -> str:
+        """Find the version of a background that was made for the size of the display,
+        such as ``page01.160x128.bmp`` for ``page01.bmp`` on a PyBadge, or the
+        background itself if there isn't one. Each background is only looked up once.
+
+        :param str filename: The filename of the background
+        :return: The filename to read
+        :rtype: str
+        """
+        variant = self._variants.get(filename)
+        if variant is None:
+            variant = filename
+            dot = filename.rfind(".")
+            if dot > filename.rfind("/"):
+                size = f".{self._display.width}x{self._display.height}"
+                candidate = filename[:dot] + size + filename[dot:]
+                if self._pack is not None and candidate in self._pack:
+                    variant = candidate
+                else:
+                    try:
+                        os.stat(self._gamedirectory + "/" + candidate)
+                        variant = candidate
+                    except OSError:
+                        pass  # there's only the original
+            self._variants[filename] = variant
+        return variant
+
+    def backlight_fade(
+        self,
+        to_light: float,
+        *,
+        duration: float = 0.3,
+        easing: Callable[[float], float] = ease_linear,
+        wait: bool = True,
+    ) -> None:
         """
         Adjust the TFT backlight. Fade from the current value to the ``to_light`` value
 
         :param float to_light: the desired backlight brightness between :py:const:`0.0` and
             :py:const:`1.0`.
+        :param float duration: the number of seconds a fade from fully off to fully on
+            takes. Shorter fades take proportionally less time.
+        :param easing: how the brightness changes over the fade, such as `ease_linear`
+            or `ease_in_out`
+        :param bool wait: If `True` return once the fade is done, otherwise return right
+            away and let `update` carry on the fade.
         """
         from_light = self._display.brightness
-        from_light = int(from_light * 100)
-        to_light = max(0, min(100, int(to_light * 100)))
-        delta = 1
-        if from_light > to_light:
-            delta = -1
-        for val in range(from_light, to_light, delta):
-            self._display.brightness = val / 100
-            time.sleep(0.003)
-        self._display.brightness = to_light / 100
+        to_light = max(0.0, min(1.0, to_light))
+        self._fade_from = from_light
+        self._fade_to = to_light
+        self._fade_easing = easing
+        self._fade_start = self._backend.monotonic()
+        self._fade_duration = duration * abs(to_light - from_light)
+        if wait:
+            while self._update_fade():
+                self._backend.sleep(0.01)
+
+    def _update_fade(self) -> bool:
+        """Set the backlight for how far the current fade has got.
+
+        :return: `True` while the fade is still in progress
+        :rtype: bool
+        """
+        if self._fade_to is None:
+            return False
+        elapsed = self._backend.monotonic() - self._fade_start
+        if elapsed >= self._fade_duration:
+            self._display.brightness = self._fade_to
+            self._fade_to = None
+            return False
+        progress = self._fade_easing(elapsed / self._fade_duration)
+        self._display.brightness = self._fade_from + (self._fade_to - self._fade_from) * progress
+        return True
 
     # return a list of lines with wordwrapping
     @staticmethod
@@ -473,23 +3082,16 @@ class PYOA_Graphics:
         :return: The list of lines
         :rtype: list(str)
         """
-        # string = string.replace('\n', '').replace('\r', '') # strip confusing newlines
-        words = string.split(" ")
         the_lines = []
-        the_line = ""
-        for w in words:
-            if "\n" in w:
-                _w1, _w2 = w.split("\n")
-                the_line += " " + _w1
-                the_lines.append(the_line)
-                the_line = _w2
-            elif len(the_line + " " + w) > max_chars:
-                the_lines.append(the_line)
-                the_line = "" + w
-            else:
-                the_line += " " + w
-        if the_line:  # last line remaining
-            the_lines.append(the_line)
-        # remove first space from first line:
-        the_lines[0] = the_lines[0][1:]
+        for paragraph in string.split("\n"):
+            line_words = []
+            line_length = -1  # there's no space before the first word
+            for word in paragraph.split(" "):
+                if line_words and line_length + 1 + len(word) > max_chars:
+                    the_lines.append(" ".join(line_words))
+                    line_words = []
+                    line_length = -1
+                line_words.append(word)
+                line_length += 1 + len(word)
+            the_lines.append(" ".join(line_words))
         return the_lines
@@ -0,0 +1,154 @@
+# SPDX-FileCopyrightText: 2026 Adafruit Industries
+#
+# SPDX-License-Identifier: MIT
+
+"""
+`adafruit_pyoa_headless`
+================================================================================
+
+Stand-in hardware for running `adafruit_pyoa` games on a computer, for tests,
+benchmarks and replays. This is kept apart from `adafruit_pyoa` so the boards
+don't have to load it.
+
+
+* Author(s): Adafruit
+
+Implementation Notes
+--------------------
+
+**Software and Dependencies:**
+
+* Adafruit-Blinka and adafruit-blinka-displayio, along with the requirements of
+  `adafruit_pyoa`
+"""
+
+import displayio
+
+try:
+    from typing import Any, Optional, Tuple
+except ImportError:
+    pass
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/adafruit/Adafruit_CircuitPython_PYOA.git"
+
+
+class HeadlessDisplay:
+    """A display that only exists in memory, for running games without hardware.
+
+    It keeps the brightness and root group set by `PYOA_Graphics` and counts refreshes,
+    but does not draw any pixels.
+
+    :param int width: the width of the display in pixels
+    :param int height: the height of the display in pixels
+    """
+
+    def __init__(self, width: int = 320, height: int = 240) -> None:
+        self.width = width
+        self.height = height
+        self.brightness = 1.0
+        self.auto_refresh = True
+        self.root_group = None
+        self.refresh_count = 0
+
+    def refresh(self, **_kwargs: Any) -> bool:
+        """Count a refresh."""
+        self.refresh_count += 1
+        return True
+
+
+class HeadlessTouchscreen:
+    """A touchscreen that replays a list of touches, for running games without hardware."""
+
+    def __init__(self) -> None:
+        self._touches = []
+
+    def touch(self, point: Optional[Tuple[int, int]]) -> None:
+        """Queue one reading of the touchscreen.
+
+        :param point: where the screen is touched, or `None` for no touch
+        :type point: tuple(int, int) or None
+        """
+        self._touches.append(point)
+
+    @property
+    def touch_point(self) -> Optional[Tuple[int, int]]:
+        """The next queued touch, or `None` once they have all been read."""
+        if self._touches:
+            return self._touches.pop(0)
+        return None
+
+
+class _NullPin:
+    """An output pin that goes nowhere."""
+
+    value = False
+
+
+class _NullAudio:
+    """An audio output that plays nothing. Sounds that don't loop finish straight away."""
+
+    playing = False
+
+    def play(self, _sample: Any, *, loop: bool = False) -> None:
+        """Start "playing" a sample."""
+        self.playing = loop
+
+    def stop(self) -> None:
+        """Stop "playing"."""
+        self.playing = False
+
+
+class _NullSample:
+    """A sample that has no audio data."""
+
+    def deinit(self) -> None:
+        """Release the sample."""
+
+
+class HeadlessBackend:
+    """Stand-in hardware for running games on a computer, for tests and benchmarks.
+
+    Drawing happens in memory on a `HeadlessDisplay`, touches are read from a
+    `HeadlessTouchscreen` and sounds are not played. Time only moves on when the game
+    sleeps, so waits such as ``auto_advance`` take no real time.
+
+    :param int width: the width of the display in pixels
+    :param int height: the height of the display in pixels
+    """
+
+    def __init__(self, width: int = 320, height: int = 240) -> None:
+        self.display = HeadlessDisplay(width, height)
+        self.speaker_enable = _NullPin()
+        self.audio = _NullAudio()
+        self.touchscreen = HeadlessTouchscreen()
+        self._now = 0.0
+
+    def make_cursor(self, root_group: displayio.Group) -> None:
+        """Headless games always use the touchscreen."""
+        raise AttributeError("PYOA requires a touchscreen or cursor.")
+
+    @staticmethod
+    def make_wave(_wav_file: Any, _buffer: bytearray) -> _NullSample:
+        """Create a silent sample."""
+        return _NullSample()
+
+    def tap(self, x: int, y: int) -> None:
+        """Queue a touch at a point followed by a release.
+
+        :param int x: the x coordinate of the touch, in display pixels
+        :param int y: the y coordinate of the touch, in display pixels
+        """
+        self.touchscreen.touch((x, y))
+        self.touchscreen.touch(None)
+
+    def monotonic(self) -> float:
+        """The simulated time in seconds."""
+        return self._now
+
+    def sleep(self, seconds: float) -> None:
+        """Move the simulated time on.
+
+        :param float seconds: how far to move the time
+        """
+        self._now += seconds
@@ -37,6 +37,7 @@ autodoc_mock_imports = [
     "supervisor",
     "terminalio",
     "bitmaptools",
+    "vectorio",
 ]
 
 intersphinx_mapping = {
@@ -0,0 +1,72 @@
+# SPDX-FileCopyrightText: 2026 Adafruit Industries
+# SPDX-License-Identifier: MIT
+
+# Compare how long each background of a game takes to open and draw, as the
+# original bitmap and as the copy pyoa_prepare_backgrounds.py made for this
+# display. Run it on the board. It also runs on a computer with Adafruit-Blinka
+# and adafruit-blinka-displayio installed, pretending to be a PyPortal, but
+# without a real display to draw on that only checks every bitmap can be opened.
+
+import json
+import os
+import time
+
+import displayio
+
+try:
+    import board
+
+    display = board.DISPLAY
+except (ImportError, AttributeError):
+    from adafruit_pyoa_headless import HeadlessBackend
+
+    display = HeadlessBackend(320, 240).display
+
+GAME_DIRECTORY = "/cyoa" if "cyoa" in os.listdir("/") else "cyoa"
+REPEATS = 5
+
+with open(GAME_DIRECTORY + "/cyoa.json") as game_file:
+    game = json.load(game_file)
+cards = game["cards"] if isinstance(game, dict) else game
+backgrounds = []
+for card in cards:
+    name = card.get("background_image", None)
+    if name and name not in backgrounds:
+        backgrounds.append(name)
+
+group = displayio.Group()
+display.root_group = group
+display.auto_refresh = False
+
+
+def time_background(path):
+    """Return the best open and draw times of a bitmap, in milliseconds."""
+    open_ms = draw_ms = None
+    for _ in range(REPEATS):
+        start = time.monotonic_ns()
+        bitmap = displayio.OnDiskBitmap(path)
+        sprite = displayio.TileGrid(bitmap, pixel_shader=bitmap.pixel_shader)
+        opened = time.monotonic_ns()
+        group.append(sprite)
+        display.refresh()
+        drawn = time.monotonic_ns()
+        group.pop()
+        display.refresh()  # start the next draw from a blank screen
+        open_ms = min(open_ms or opened - start, opened - start)
+        draw_ms = min(draw_ms or drawn - opened, drawn - opened)
+    return open_ms / 1_000_000, draw_ms / 1_000_000
+
+
+size = f".{display.width}x{display.height}"
+print(f"background, bytes, open ms, draw ms on a {display.width}x{display.height} display")
+for name in backgrounds:
+    dot = name.rfind(".")
+    for filename in (name, name[:dot] + size + name[dot:]):
+        path = GAME_DIRECTORY + "/" + filename
+        try:
+            file_size = os.stat(path)[6]
+        except OSError:
+            continue  # no copy was made for this display
+        open_ms, draw_ms = time_background(path)
+        print(f"{filename}, {file_size}, {open_ms:.1f}, {draw_ms:.1f}")
+display.auto_refresh = True
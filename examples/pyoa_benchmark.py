@@ -0,0 +1,93 @@
+# SPDX-FileCopyrightText: 2026 Adafruit Industries
+# SPDX-License-Identifier: MIT
+
+# Measure how long it takes to move between cards. This builds a synthetic
+# 1,000 card game, plays a fixed path through it on the headless backend and
+# reports the median (p50) and 95th percentile (p95) time of each phase of
+# displaying a card, and how many times the display was refreshed. The input
+# latency is reported separately, as it is measured on the headless backend's
+# simulated clock rather than in real time. Run it on a
+# computer from the examples directory, with Adafruit-Blinka and
+# adafruit-blinka-displayio installed.
+
+import json
+import shutil
+import tempfile
+
+from adafruit_pyoa import PYOA_Graphics, TransitionProfiler
+from adafruit_pyoa_headless import HeadlessBackend
+
+CARD_COUNT = 1000
+TRANSITIONS = 500
+LEFT_BUTTON = (70, 215)
+RIGHT_BUTTON = (250, 215)
+PHASES = (
+    "hide",
+    "buttons",
+    "background",
+    "backlight_fade",
+    "text",
+    "refresh",
+    "sound",
+    "prefetch",
+    "total",
+)
+
+
+def write_game(game_directory):
+    """Write a game where every card links to the next card and the one after."""
+    cards = []
+    for card_num in range(CARD_COUNT):
+        cards.append(
+            {
+                "card_id": f"card {card_num}",
+                "background_image": f"page0{card_num % 4 + 1}.bmp",
+                "text": f"This is card {card_num} of {CARD_COUNT}. Which way will you go?",
+                "text_color": "0x000001",
+                "button01_text": "Left",
+                "button01_goto_card_id": f"card {(card_num + 1) % CARD_COUNT}",
+                "button02_text": "Right",
+                "button02_goto_card_id": f"card {(card_num + 2) % CARD_COUNT}",
+            }
+        )
+    with open(game_directory + "/cyoa.json", "w") as game_file:
+        json.dump(cards, game_file)
+    for page in range(1, 5):
+        shutil.copy(f"cyoa/page0{page}.bmp", game_directory)
+
+
+def percentile(times, fraction):
+    return times[min(len(times) - 1, int(len(times) * fraction))]
+
+
+game_directory = tempfile.mkdtemp()
+write_game(game_directory)
+
+backend = HeadlessBackend(320, 240)
+gfx = PYOA_Graphics(backend=backend)
+gfx.load_game(game_directory)
+gfx.profiler = TransitionProfiler()
+
+current_card = 0
+for transition in range(TRANSITIONS):
+    # a fixed path: two lefts then a right, over and over
+    backend.tap(*(RIGHT_BUTTON if transition % 3 == 2 else LEFT_BUTTON))
+    current_card = gfx.display_card(current_card)
+
+print(f"{TRANSITIONS} transitions through {CARD_COUNT} cards")
+print(f"{'phase':>15} {'p50 ms':>8} {'p95 ms':>8}")
+for phase in PHASES:
+    times = gfx.profiler.phase_times(phase)
+    p50 = percentile(times, 0.50) / 1_000_000
+    p95 = percentile(times, 0.95) / 1_000_000
+    print(f"{phase:>15} {p50:8.3f} {p95:8.3f}")
+
+times = gfx.profiler.phase_times("input")
+p50 = percentile(times, 0.50) / 1_000_000
+p95 = percentile(times, 0.95) / 1_000_000
+print(f"{'input':>15} {p50:8.3f} {p95:8.3f} (simulated clock)")
+
+refreshes = [count for _, name, count in gfx.profiler.counts if name == "refreshes"]
+print(f"{sum(refreshes)} display refreshes, {refreshes.count(0)} cards needed none")
+
+shutil.rmtree(game_directory)
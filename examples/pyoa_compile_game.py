@@ -0,0 +1,163 @@
+# SPDX-FileCopyrightText: 2026 Adafruit Industries
+# SPDX-License-Identifier: MIT
+
+"""
+Compile a cyoa.json game into the compact cyoa.pyoa format read by
+adafruit_pyoa.CompiledCards. Run this on your computer, not on the board:
+
+    python pyoa_compile_game.py /path/to/game_directory
+
+then copy the new cyoa.pyoa next to cyoa.json. PYOA_Graphics.load_game uses
+the compiled file whenever it is present, so recompile after editing cyoa.json.
+Use --verify to read the compiled file back and compare it to cyoa.json.
+"""
+
+import argparse
+import json
+import struct
+
+# These must match adafruit_pyoa.CompiledCards
+MAGIC = b"PYOA"
+VERSION = 1
+HEADER = "<4sBBHHI"
+PAIR = "<HHH"
+KIND_STRING = 0
+KIND_CARD = 1
+KIND_JSON = 2
+FLAG_SETTINGS = 1
+GOTO_SUFFIX = "_goto_card_id"
+
+
+def compile_game(cards, settings=None):
+    """Return the compiled bytes for a list of cards and the game's settings."""
+    card_index = {}
+    for card_num, card in enumerate(cards):
+        card_id = card.get("card_id", "")
+        if card_id in card_index:
+            raise ValueError(f"Duplicate 'card_id': {card_id}")
+        if card_id:
+            card_index[card_id] = card_num
+
+    # the card ids come first so the board can read them all at once
+    strings = [card.get("card_id", "") for card in cards]
+    string_index = {}
+    for index, string in enumerate(strings):
+        string_index.setdefault(string, index)
+    flags = 0
+    if settings:
+        # the settings always follow the card ids
+        flags |= FLAG_SETTINGS
+        strings.append(json.dumps(settings))
+
+    def intern(string):
+        if string not in string_index:
+            string_index[string] = len(strings)
+            strings.append(string)
+        return string_index[string]
+
+    pairs = []
+    card_pairs = [0]
+    for card_num, card in enumerate(cards):
+        # a list of buttons is kept as JSON, so its card ids are only checked
+        for button in card.get("buttons", []):
+            if button.get("goto_card_id") not in card_index:
+                raise ValueError(
+                    f"Could not find card with matching 'card_id': {button.get('goto_card_id')}"
+                )
+        for key, value in card.items():
+            if key == "card_id":
+                pairs.append((intern(key), KIND_STRING, card_num))
+            elif key.endswith(GOTO_SUFFIX):
+                if value not in card_index:
+                    raise ValueError(f"Could not find card with matching 'card_id': {value}")
+                pairs.append((intern(key), KIND_CARD, card_index[value]))
+            elif isinstance(value, str):
+                pairs.append((intern(key), KIND_STRING, intern(value)))
+            else:
+                pairs.append((intern(key), KIND_JSON, intern(json.dumps(value))))
+        card_pairs.append(len(pairs))
+
+    if len(cards) > 0xFFFF or len(strings) > 0xFFFF:
+        raise ValueError("Game is too large to compile")
+
+    pool = bytearray()
+    string_offsets = [0]
+    for string in strings:
+        pool += string.encode("utf-8")
+        string_offsets.append(len(pool))
+
+    data = bytearray(
+        struct.pack(HEADER, MAGIC, VERSION, flags, len(cards), len(strings), len(pairs))
+    )
+    data += struct.pack(f"<{len(string_offsets)}I", *string_offsets)
+    data += struct.pack(f"<{len(card_pairs)}I", *card_pairs)
+    for pair in pairs:
+        data += struct.pack(PAIR, *pair)
+    data += pool
+    return bytes(data)
+
+
+def decompile_game(data):
+    """Read compiled bytes back into a list of cards, with goto targets as card ids,
+    and the game's settings."""
+    magic, version, flags, card_count, string_count, pair_count = struct.unpack_from(HEADER, data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a compiled PYOA game")
+    position = struct.calcsize(HEADER)
+    string_offsets = struct.unpack_from(f"<{string_count + 1}I", data, position)
+    position += 4 * (string_count + 1)
+    card_pairs = struct.unpack_from(f"<{card_count + 1}I", data, position)
+    position += 4 * (card_count + 1)  # pairs are 6 bytes each
+    pool_start = position + struct.calcsize(PAIR) * pair_count
+
+    def string(index):
+        start = pool_start + string_offsets[index]
+        end = pool_start + string_offsets[index + 1]
+        return data[start:end].decode("utf-8")
+
+    cards = []
+    for card_num in range(card_count):
+        card = {}
+        for pair in range(card_pairs[card_num], card_pairs[card_num + 1]):
+            key, kind, value = struct.unpack_from(PAIR, data, position + 6 * pair)
+            if kind == KIND_CARD:
+                card[string(key)] = string(value)  # the card id of the target card
+            elif kind == KIND_JSON:
+                card[string(key)] = json.loads(string(value))
+            else:
+                card[string(key)] = string(value)
+        cards.append(card)
+    if flags & FLAG_SETTINGS:
+        return cards, json.loads(string(card_count))
+    return cards, {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile cyoa.json into cyoa.pyoa")
+    parser.add_argument("game_directory", help="the directory holding cyoa.json")
+    parser.add_argument(
+        "--verify", action="store_true", help="check the compiled game matches cyoa.json"
+    )
+    args = parser.parse_args()
+
+    with open(args.game_directory + "/cyoa.json") as game_file:
+        game = json.load(game_file)
+    # a game is either a list of cards or has its cards next to its settings
+    if isinstance(game, dict):
+        cards, settings = game["cards"], game.get("settings", {})
+    else:
+        cards, settings = game, {}
+    data = compile_game(cards, settings)
+    with open(args.game_directory + "/cyoa.pyoa", "wb") as compiled_file:
+        compiled_file.write(data)
+    json_size = len(json.dumps(game))
+    print(f"Compiled {len(cards)} cards: {json_size} bytes of JSON -> {len(data)} bytes")
+
+    if args.verify:
+        if decompile_game(data) != (cards, settings):
+            raise SystemExit("Compiled game does not match cyoa.json!")
+        print("Verified: the compiled game matches cyoa.json")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# SPDX-FileCopyrightText: 2026 Adafruit Industries
+# SPDX-License-Identifier: MIT
+
+# Compare the time and memory needed to load a game from cyoa.json with
+# json.load against loading the compiled cyoa.pyoa made by pyoa_compile_game.py.
+# Copy both files of a game into GAME_DIRECTORY before running this.
+
+import gc
+import json
+import time
+
+from adafruit_pyoa import CompiledCards
+
+GAME_DIRECTORY = "/cyoa"
+
+
+def measure(function):
+    """Return how long ``function`` took in milliseconds and the memory it kept."""
+    gc.collect()
+    before = gc.mem_free()
+    start = time.monotonic_ns()
+    result = function()
+    duration = (time.monotonic_ns() - start) / 1_000_000
+    gc.collect()
+    used = before - gc.mem_free()
+    del result
+    return duration, used
+
+
+def load_json():
+    with open(GAME_DIRECTORY + "/cyoa.json") as game_file:
+        cards = json.load(game_file)
+    card_index = {card.get("card_id"): card_num for card_num, card in enumerate(cards)}
+    return cards, card_index
+
+
+def load_compiled():
+    cards = CompiledCards(GAME_DIRECTORY + "/cyoa.pyoa")
+    return cards, cards.card_index()
+
+
+for name, loader in (("json.load", load_json), ("cyoa.pyoa", load_compiled)):
+    milliseconds, memory = measure(loader)
+    print(f"{name}: {milliseconds:.1f} ms, {memory} bytes")
@@ -0,0 +1,33 @@
+# SPDX-FileCopyrightText: 2026 Adafruit Industries
+# SPDX-License-Identifier: MIT
+
+# Play through a game on a computer, without any hardware, by tapping the
+# screen from a script. Install Adafruit-Blinka and adafruit-blinka-displayio
+# (along with the other requirements of this library) and run this from the
+# examples directory.
+
+import time
+
+from adafruit_pyoa import PYOA_Graphics
+from adafruit_pyoa_headless import HeadlessBackend
+
+# Where to tap for each choice, on a 320x240 display like the PyPortal's
+LEFT_BUTTON = (70, 215)
+MIDDLE_BUTTON = (160, 215)
+RIGHT_BUTTON = (250, 215)
+
+backend = HeadlessBackend(320, 240)
+gfx = PYOA_Graphics(backend=backend)
+gfx.load_game("cyoa")
+
+current_card = 0  # start with first card
+# the first card advances by itself, so it needs no tap
+for tap in (None, RIGHT_BUTTON, RIGHT_BUTTON, MIDDLE_BUTTON, LEFT_BUTTON):
+    if tap:
+        backend.tap(*tap)
+    start = time.monotonic_ns()
+    next_card = gfx.display_card(current_card)
+    took = (time.monotonic_ns() - start) / 1_000_000
+    print(f"Card {current_card} -> {next_card} in {took:.2f} ms")
+    current_card = next_card
+print(f"Played {backend.monotonic():.1f} seconds of game time")
@@ -0,0 +1,75 @@
+# SPDX-FileCopyrightText: 2026 Adafruit Industries
+# SPDX-License-Identifier: MIT
+
+# Compare the memory used by loading a whole cyoa.json with json.load
+# against the LazyCards loader, for synthetic games of increasing size.
+# Runs on CircuitPython (using gc.mem_free) or on a desktop (using tracemalloc).
+
+import gc
+import json
+import os
+
+from adafruit_pyoa import LazyCards
+
+# Somewhere writable: an SD card on a microcontroller or /tmp on a desktop
+BENCH_DIRECTORY = "/sd" if "sd" in os.listdir("/") else "/tmp"
+CARD_COUNTS = (10, 100, 500, 1000)
+
+try:
+    import tracemalloc
+
+    def measure(function):
+        """Return the result of ``function`` and the peak memory it allocated."""
+        tracemalloc.start()
+        result = function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result, peak
+
+except ImportError:
+
+    def measure(function):
+        """Return the result of ``function`` and the memory it kept allocated."""
+        gc.collect()
+        before = gc.mem_free()
+        result = function()
+        gc.collect()
+        return result, before - gc.mem_free()
+
+
+def write_game(filename, card_count):
+    """Write a game of ``card_count`` cards that each link to the next two."""
+    with open(filename, "w") as game_file:
+        game_file.write("[\n")
+        for card_num in range(card_count):
+            card = {
+                "card_id": f"card {card_num}",
+                "background_image": "page01.bmp",
+                "text": f"This is card number {card_num}. Where will you go next?",
+                "text_color": "0x000001",
+                "button01_text": "Left",
+                "button01_goto_card_id": f"card {(card_num + 1) % card_count}",
+                "button02_text": "Right",
+                "button02_goto_card_id": f"card {(card_num + 2) % card_count}",
+            }
+            game_file.write(json.dumps(card))
+            game_file.write(",\n" if card_num < card_count - 1 else "\n")
+        game_file.write("]\n")
+
+
+def load_eager(filename):
+    with open(filename) as game_file:
+        return json.load(game_file)
+
+
+print("cards, json.load bytes, LazyCards bytes")
+for count in CARD_COUNTS:
+    game_filename = BENCH_DIRECTORY + "/pyoa_bench.json"
+    write_game(game_filename, count)
+    eager_game, eager_bytes = measure(lambda: load_eager(game_filename))
+    del eager_game
+    lazy_game, lazy_bytes = measure(lambda: LazyCards(game_filename))
+    lazy_game.close()
+    del lazy_game
+    print(f"{count}, {eager_bytes}, {lazy_bytes}")
+    os.remove(game_filename)
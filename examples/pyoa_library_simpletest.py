@@ -0,0 +1,34 @@
+# SPDX-FileCopyrightText: 2026 Adafruit Industries
+# SPDX-License-Identifier: MIT
+
+# Play every game in /sd/games in turn, moving on to the next game each time the
+# one being played goes back to its first card. Each game is in its own
+# directory, such as /sd/games/cave/cyoa.json, and games can share images and
+# sounds, for example by using "../common/title.bmp" as a background.
+
+import gc
+
+import board
+import sdcardio
+import storage
+
+from adafruit_pyoa import GameLibrary, PYOA_Graphics
+
+sdcard = sdcardio.SDCard(board.SPI(), board.SD_CS)
+storage.mount(storage.VfsFat(sdcard), "/sd")
+
+gfx = PYOA_Graphics()
+library = GameLibrary(gfx, "/sd/games")
+print("Games:", ", ".join(library.games))
+
+game = 0
+while True:
+    library.load(game)
+    gc.collect()
+    print("Playing", library.current, "with", gc.mem_free(), "bytes free")
+    current_card = 0
+    while True:
+        current_card = gfx.display_card(current_card)
+        if current_card == 0:
+            break
+    game = (game + 1) % len(library)
@@ -0,0 +1,31 @@
+# SPDX-FileCopyrightText: 2026 Adafruit Industries
+# SPDX-License-Identifier: MIT
+
+# Run a game while doing other work in the same loop. start_card displays a
+# card and returns right away, then update handles the player's choice and
+# returns the next card number once there is one.
+
+import time
+
+import board
+import neopixel
+
+from adafruit_pyoa import PYOA_Graphics
+
+pixel = neopixel.NeoPixel(board.NEOPIXEL, 1, brightness=0.2)
+
+gfx = PYOA_Graphics()
+gfx.load_game("/cyoa")
+gfx.start_card(0)  # start with first card
+
+hue = 0
+while True:
+    next_card = gfx.update()
+    if next_card is not None:
+        print("Current card:", next_card)
+        gfx.start_card(next_card)
+
+    # anything else can run here, like this slow rainbow
+    hue = (hue + 1) % 256
+    pixel[0] = (hue, 255 - hue, 128)
+    time.sleep(0.01)
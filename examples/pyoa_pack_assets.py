@@ -0,0 +1,100 @@
+# SPDX-FileCopyrightText: 2026 Adafruit Industries
+# SPDX-License-Identifier: MIT
+
+"""
+Pack the images and sounds of a game into a single cyoa.pak file read by
+adafruit_pyoa.AssetPack. Run this on your computer, not on the board:
+
+    python pyoa_pack_assets.py /path/to/game_directory
+
+then copy cyoa.pak next to cyoa.json. The separate image and sound files are
+no longer needed on the board. Repack after changing any of them.
+"""
+
+import json
+import os
+import struct
+
+# These must match adafruit_pyoa.AssetPack
+MAGIC = b"PYPK"
+VERSION = 1
+HEADER = "<4sBBH"
+ENTRY = "<IIB"
+# assets start on a new SD card sector, so reading one touches as few sectors as possible
+ALIGN = 512
+
+
+def game_assets(game_directory):
+    """Return the filenames of every image and sound used by a game, along with the
+    copies of its backgrounds made by pyoa_prepare_backgrounds.py."""
+    with open(game_directory + "/cyoa.json") as game_file:
+        game = json.load(game_file)
+    cards = game["cards"] if isinstance(game, dict) else game
+    names = []
+    backgrounds = []
+    for card in cards:
+        for key in ("background_image", "sound"):
+            name = card.get(key, None)
+            if name and name not in names:
+                names.append(name)
+                if key == "background_image":
+                    backgrounds.append(name)
+    listings = {}
+    for name in backgrounds:
+        directory, _, filename = name.rpartition("/")
+        if directory not in listings:
+            listings[directory] = os.listdir(game_directory + "/" + directory)
+        stem, _, extension = filename.rpartition(".")
+        for other in listings[directory]:
+            # copies are named like page01.320x240.bmp
+            size = other[len(stem) + 1 : -len(extension) - 1]
+            if other.startswith(stem + ".") and other.endswith("." + extension):
+                if size.count("x") == 1 and size.replace("x", "").isdigit():
+                    names.append(directory + "/" + other if directory else other)
+    return names
+
+
+def pack_assets(directory, names, pack_filename):
+    """Write the files ``names`` from ``directory`` into a pack, returning its size."""
+    encoded = [name.encode("utf-8") for name in names]
+    if len(names) > 0xFFFF or any(len(name) > 0xFF for name in encoded):
+        raise ValueError("Too many assets, or an asset name is too long")
+    index_size = struct.calcsize(HEADER)
+    index_size += sum(struct.calcsize(ENTRY) + len(name) for name in encoded)
+    offset = index_size
+    entries = []
+    for name in names:
+        offset += -offset % ALIGN
+        length = os.stat(directory + "/" + name)[6]
+        entries.append((offset, length))
+        offset += length
+
+    with open(pack_filename, "wb") as pack_file:
+        pack_file.write(struct.pack(HEADER, MAGIC, VERSION, 0, len(names)))
+        for (asset_offset, length), name in zip(entries, encoded):
+            pack_file.write(struct.pack(ENTRY, asset_offset, length, len(name)))
+            pack_file.write(name)
+        position = index_size
+        for (asset_offset, _), name in zip(entries, names):
+            pack_file.write(bytes(asset_offset - position))
+            with open(directory + "/" + name, "rb") as asset_file:
+                data = asset_file.read()
+            pack_file.write(data)
+            position = asset_offset + len(data)
+    return offset
+
+
+def main():
+    import argparse  # only needed on a computer, pack_assets also runs on the board
+
+    parser = argparse.ArgumentParser(description="Pack a game's images and sounds into cyoa.pak")
+    parser.add_argument("game_directory", help="the directory holding cyoa.json")
+    args = parser.parse_args()
+
+    names = game_assets(args.game_directory)
+    size = pack_assets(args.game_directory, names, args.game_directory + "/cyoa.pak")
+    print(f"Packed {len(names)} images and sounds into {size} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# SPDX-FileCopyrightText: 2026 Adafruit Industries
+# SPDX-License-Identifier: MIT
+
+# Compare the time to open and read the start of every asset when they are
+# separate files against reading them from an AssetPack, for directories of
+# increasing size. Assets that PYOA_Graphics extracts to a cache directory are
+# timed too, the first time when they are copied out and again once the copies
+# exist. Copy pyoa_pack_assets.py next to this file. Runs on the
+# board, where it uses the SD card if there is one, or on a computer.
+
+import os
+import time
+
+from pyoa_pack_assets import pack_assets
+
+from adafruit_pyoa import AssetPack
+
+BENCH_DIRECTORY = ("/sd" if "sd" in os.listdir("/") else "/tmp") + "/pyoa_pack_bench"
+ASSET_COUNTS = (10, 100, 300)
+ASSET_SIZE = 2048
+READ_SIZE = 512  # about what OnDiskBitmap and WaveFile read when they open a file
+CACHE_DIRECTORY = BENCH_DIRECTORY + "/cache"
+
+
+def make_assets(count):
+    names = [f"asset{number:04d}.bmp" for number in range(count)]
+    for name in names:
+        with open(BENCH_DIRECTORY + "/" + name, "wb") as asset_file:
+            asset_file.write(bytes(ASSET_SIZE))
+    return names
+
+
+def read_loose(names):
+    for name in names:
+        with open(BENCH_DIRECTORY + "/" + name, "rb") as asset_file:
+            asset_file.seek(ASSET_SIZE // 2)
+            asset_file.read(READ_SIZE)
+
+
+def read_packed(pack, names):
+    for name in names:
+        asset_file = pack.open(name)
+        asset_file.seek(ASSET_SIZE // 2)
+        asset_file.read(READ_SIZE)
+
+
+def read_extracted(pack, names):
+    for name in names:
+        with open(pack.extract(name, CACHE_DIRECTORY), "rb") as asset_file:
+            asset_file.seek(ASSET_SIZE // 2)
+            asset_file.read(READ_SIZE)
+
+
+def time_extracted(pack_filename, names):
+    # a new pack each time, like a game being loaded again
+    asset_pack = AssetPack(pack_filename)
+    start = time.monotonic_ns()
+    read_extracted(asset_pack, names)
+    extracted_ms = (time.monotonic_ns() - start) / 1_000_000 / len(names)
+    asset_pack.close()
+    return extracted_ms
+
+
+def remove_all():
+    try:
+        for name in os.listdir(CACHE_DIRECTORY):
+            os.remove(CACHE_DIRECTORY + "/" + name)
+        os.rmdir(CACHE_DIRECTORY)
+    except OSError:
+        pass  # nothing was extracted
+    for name in os.listdir(BENCH_DIRECTORY):
+        os.remove(BENCH_DIRECTORY + "/" + name)
+
+
+try:
+    os.mkdir(BENCH_DIRECTORY)
+except OSError:
+    pass  # left over from an earlier run
+remove_all()
+
+print(
+    "assets, loose ms per asset, packed ms per asset, pack open ms,"
+    " first extract ms per asset, extracted ms per asset"
+)
+for count in ASSET_COUNTS:
+    asset_names = make_assets(count)
+    pack_filename = BENCH_DIRECTORY + "/cyoa.pak"
+    pack_assets(BENCH_DIRECTORY, asset_names, pack_filename)
+
+    start = time.monotonic_ns()
+    read_loose(asset_names)
+    loose_ms = (time.monotonic_ns() - start) / 1_000_000 / count
+
+    start = time.monotonic_ns()
+    asset_pack = AssetPack(pack_filename)
+    open_ms = (time.monotonic_ns() - start) / 1_000_000
+    start = time.monotonic_ns()
+    read_packed(asset_pack, asset_names)
+    packed_ms = (time.monotonic_ns() - start) / 1_000_000 / count
+    asset_pack.close()
+
+    first_ms = time_extracted(pack_filename, asset_names)
+    repeat_ms = time_extracted(pack_filename, asset_names)
+
+    print(
+        f"{count}, {loose_ms:.3f}, {packed_ms:.3f}, {open_ms:.1f}, {first_ms:.3f}, {repeat_ms:.3f}"
+    )
+    remove_all()
+os.rmdir(BENCH_DIRECTORY)
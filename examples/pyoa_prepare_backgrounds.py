@@ -0,0 +1,110 @@
+# SPDX-FileCopyrightText: 2026 Adafruit Industries
+# SPDX-License-Identifier: MIT
+
+"""
+Make a copy of every background of a game for each size of display, scaled to
+fill the screen and reduced to a palette of at most 256 colors. Run this on
+your computer, not on the board, with Pillow installed:
+
+    python pyoa_prepare_backgrounds.py /path/to/game_directory --colors 16
+
+A copy of page01.bmp for a 160x128 display is saved as page01.160x128.bmp.
+PYOA_Graphics uses the copy made for its display when there is one, so it
+reads a small indexed bitmap instead of a full color one. Backgrounds with 16
+colors or fewer are saved with 4 bits per pixel, which halves their size again.
+Run pyoa_pack_assets.py afterwards to pack the copies too.
+"""
+
+import argparse
+import json
+import os
+import struct
+
+from PIL import Image, ImageOps
+
+# the displays of the PyBadge and PyGamer, PyPortal and PyPortal Titano
+DEFAULT_SIZES = ("160x128", "320x240", "480x320")
+
+
+def game_backgrounds(game_directory):
+    """Return the filenames of every background used by a game."""
+    with open(game_directory + "/cyoa.json") as game_file:
+        game = json.load(game_file)
+    cards = game["cards"] if isinstance(game, dict) else game
+    names = []
+    for card in cards:
+        name = card.get("background_image", None)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def variant_name(name, width, height):
+    """Return the filename that PYOA_Graphics looks for on a display of this size."""
+    stem, extension = os.path.splitext(name)
+    return f"{stem}.{width}x{height}{extension}"
+
+
+def prepare(image, width, height, colors):
+    """Scale and crop an image to fill the display, and reduce its colors."""
+    image = ImageOps.fit(image.convert("RGB"), (width, height), Image.Resampling.LANCZOS)
+    return image.quantize(colors)
+
+
+def save_4bit_bmp(image, filename):
+    """Save an image with a palette of up to 16 colors as a 4 bit per pixel BMP,
+    which Pillow can't write itself."""
+    width, height = image.size
+    row_size = ((width + 1) // 2 + 3) & ~3  # rows are padded to 4 bytes
+    palette = image.getpalette()[: 16 * 3]
+    palette += [0] * (16 * 3 - len(palette))
+    offset = 14 + 40 + 16 * 4
+    pixels = image.tobytes()
+    with open(filename, "wb") as bmp_file:
+        bmp_file.write(struct.pack("<2sIHHI", b"BM", offset + row_size * height, 0, 0, offset))
+        bmp_file.write(struct.pack("<IiiHHIIiiII", 40, width, height, 1, 4, 0, 0, 0, 0, 16, 16))
+        for index in range(16):
+            red, green, blue = palette[index * 3 : index * 3 + 3]
+            bmp_file.write(bytes((blue, green, red, 0)))
+        for y in range(height - 1, -1, -1):  # bottom row first
+            row = bytearray(row_size)
+            for x in range(width):
+                row[x // 2] |= pixels[y * width + x] << (0 if x % 2 else 4)
+            bmp_file.write(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Make backgrounds for each size of display")
+    parser.add_argument("game_directory", help="the directory holding cyoa.json")
+    parser.add_argument(
+        "--size",
+        action="append",
+        help="a display size such as 320x240, can be given more than once",
+    )
+    parser.add_argument("--colors", type=int, default=256, help="the most colors to use")
+    args = parser.parse_args()
+    if not 2 <= args.colors <= 256:
+        parser.error("--colors must be between 2 and 256")
+
+    for name in game_backgrounds(args.game_directory):
+        original = args.game_directory + "/" + name
+        original_size = os.stat(original).st_size
+        with Image.open(original) as image:
+            for size in args.size or DEFAULT_SIZES:
+                width, height = (int(number) for number in size.split("x"))
+                variant = args.game_directory + "/" + variant_name(name, width, height)
+                prepared = prepare(image, width, height, args.colors)
+                if args.colors <= 16:
+                    save_4bit_bmp(prepared, variant)
+                else:
+                    prepared.save(variant, "BMP")
+                variant_size = os.stat(variant).st_size
+                if image.size == (width, height) and variant_size >= original_size:
+                    os.remove(variant)  # the original is already as small as it gets
+                    print(f"{name} {size}: kept the original")
+                else:
+                    print(f"{name} {size}: {original_size} -> {variant_size} bytes")
+
+
+if __name__ == "__main__":
+    main()
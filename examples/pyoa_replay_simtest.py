@@ -0,0 +1,56 @@
+# SPDX-FileCopyrightText: 2026 Adafruit Industries
+# SPDX-License-Identifier: MIT
+
+# Record a playthrough on a computer and play it back without any taps, timing
+# every card. On the board, record the player's choices to a file by setting
+# gfx.recorder = PlaythroughRecorder(filename="/sd/pyoa.rec"), then copy the
+# file to a computer and pass it to this script to replay the same path:
+#
+#     python pyoa_replay_simtest.py pyoa.rec
+#
+# Install Adafruit-Blinka and adafruit-blinka-displayio (along with the other
+# requirements of this library) and run this from the examples directory.
+
+import sys
+
+from adafruit_pyoa import PlaythroughRecorder, PYOA_Graphics, TransitionProfiler
+from adafruit_pyoa_headless import HeadlessBackend
+
+# Where to tap for each choice, on a 320x240 display like the PyPortal's
+LEFT_BUTTON = (70, 215)
+MIDDLE_BUTTON = (160, 215)
+RIGHT_BUTTON = (250, 215)
+
+if len(sys.argv) > 1:
+    records = PlaythroughRecorder.read(sys.argv[1])
+else:
+    # play a few cards by tapping, as in pyoa_headless_simtest.py, to make a recording
+    backend = HeadlessBackend(320, 240)
+    gfx = PYOA_Graphics(backend=backend)
+    gfx.load_game("cyoa")
+    gfx.recorder = PlaythroughRecorder()
+    current_card = 0
+    for tap in (None, RIGHT_BUTTON, RIGHT_BUTTON, MIDDLE_BUTTON, LEFT_BUTTON):
+        if tap:
+            backend.tap(*tap)
+        current_card = gfx.display_card(current_card)
+    records = gfx.recorder.records
+
+print("Recorded:")
+for milliseconds, card_num, choice in records:
+    pressed = "advanced" if choice == PlaythroughRecorder.AUTO_ADVANCE else f"button {choice}"
+    print(f"{milliseconds:>8} ms  card {card_num}  {pressed}")
+
+backend = HeadlessBackend(320, 240)
+gfx = PYOA_Graphics(backend=backend)
+gfx.load_game("cyoa")
+gfx.profiler = TransitionProfiler()
+current_card = gfx.replay(records)
+for _ in records:
+    current_card = gfx.display_card(current_card)
+
+print("Replayed:")
+for card_num, phase, nanoseconds, _ in gfx.profiler.records:
+    if phase == "total":
+        print(f"card {card_num} displayed in {nanoseconds / 1_000_000:.2f} ms")
+print(f"Finished on card {current_card}")
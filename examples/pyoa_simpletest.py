@@ -4,8 +4,9 @@
 import board
 import storage
 
-from adafruit_pyoa import PYOA_Graphics
+from adafruit_pyoa import PYOA_Graphics, SaveState
 
+save_file = None
 try:
     try:
         import sdcardio
@@ -22,13 +23,17 @@ try:
     vfs = storage.VfsFat(sdcard)
     storage.mount(vfs, "/sd")
     print("SD card found")  # no biggie
+    save_file = "/sd/pyoa.sav"
 except OSError:
     print("No SD card found")  # no biggie
 
 gfx = PYOA_Graphics()
+if save_file:
+    # carry on from where the player was after a power cycle
+    gfx.save_state = SaveState(save_file)
 
 gfx.load_game("/cyoa")
-current_card = 0  # start with first card
+current_card = gfx.resume()  # start with first card, unless there's a save
 
 while True:
     print("Current card:", current_card)
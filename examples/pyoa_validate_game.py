@@ -0,0 +1,45 @@
+# SPDX-FileCopyrightText: 2026 Adafruit Industries
+# SPDX-License-Identifier: MIT
+
+"""
+Check a game for broken links, cards that can't be reached, dead ends, loops
+that can't be left and missing images or sounds, before copying it to the board.
+Run this on your computer, with Adafruit-Blinka and adafruit-blinka-displayio
+installed:
+
+    python pyoa_validate_game.py /path/to/game_directory
+"""
+
+import argparse
+import json
+import time
+
+from adafruit_pyoa import AssetPack, validate_game
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check a cyoa.json game for mistakes")
+    parser.add_argument("game_directory", help="the directory holding cyoa.json")
+    args = parser.parse_args()
+
+    with open(args.game_directory + "/cyoa.json") as game_file:
+        game = json.load(game_file)
+    cards = game["cards"] if isinstance(game, dict) else game
+    try:
+        pack = AssetPack(args.game_directory + "/cyoa.pak")
+    except OSError:
+        pack = None  # the images and sounds are separate files
+
+    start = time.monotonic()
+    problems = validate_game(cards, args.game_directory, pack=pack)
+    duration = time.monotonic() - start
+    for kind, card_num, detail in problems:
+        card_id = cards[card_num].get("card_id", "")
+        print(f"card {card_num} ({card_id}): {kind}" + ("" if detail is None else f" {detail}"))
+    print(f"Checked {len(cards)} cards in {duration * 1000:.1f} ms: {len(problems)} problems")
+    if problems:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()